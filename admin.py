@@ -0,0 +1,233 @@
+# admin.py
+# The admin dashboard: moderation queues, categories, users and order export.
+from datetime import datetime
+
+from flask import (Blueprint, current_app, flash, jsonify, redirect, render_template, request,
+                   session, stream_with_context, url_for)
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from catalog import invalidate_catalog
+from extensions import db
+from models import Category, Order, Product, User, role_map
+from moderation import ACTIONS as MODERATION_ACTIONS, parse_ids
+from order_export import FORMATS as EXPORT_FORMATS, export_orders, parse_date
+from pagination import paginate_request
+
+admin = Blueprint('admin', __name__)
+
+def admin_dashboard_stats():
+    """Headline numbers for the admin dashboard, counted in SQL."""
+    stats = {'users': 0, 'farmers': 0, 'pending_farmers': 0, 'customers': 0, 'admins': 0,
+             'products': 0, 'approved_products': 0, 'pending_products': 0}
+
+    user_counts = db.session.query(User.role_id, User.is_approved, func.count(User.id)) \
+        .group_by(User.role_id, User.is_approved)
+    for role_id, is_approved, count in user_counts:
+        role_name = role_map.name(role_id)
+        stats['users'] += count
+        stats[role_name + 's'] = stats.get(role_name + 's', 0) + count
+        if role_name == 'farmer' and not is_approved:
+            stats['pending_farmers'] += count
+
+    product_counts = db.session.query(Product.approved, func.count(Product.id)) \
+        .group_by(Product.approved)
+    for approved, count in product_counts:
+        stats['products'] += count
+        stats['approved_products' if approved else 'pending_products'] += count
+
+    stats['orders'] = db.session.query(func.count(Order.id)).scalar()
+    return stats
+
+@admin.route('/admin_dashboard')
+def admin_dashboard():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    stats = admin_dashboard_stats()
+    categories = Category.query.order_by(Category.id).all()
+
+    pending_farmers = paginate_request(
+        User.query
+            .filter(User.role_id == role_map.id('farmer'),
+                    or_(User.is_approved == False, User.is_approved.is_(None))),
+        [(User.id, False)], prefix='farmers_')
+    with_farmer = Product.query.options(joinedload(Product.farmer))
+    pending_products = paginate_request(with_farmer.filter_by(approved=False),
+                                        [(Product.id, False)], prefix='pending_')
+    approved_products = paginate_request(with_farmer.filter_by(approved=True),
+                                         [(Product.id, True)], prefix='approved_')
+    users = paginate_request(User.query, [(User.id, False)], prefix='users_')
+    return render_template('admin_dashboard.html',
+                           stats=stats,
+                           pending_farmers=pending_farmers,
+                           pending_products=pending_products,
+                           approved_products=approved_products,
+                           users=users,
+                           categories=categories)
+
+@admin.route('/admin/<any(products, farmers):queue>/bulk', methods=['POST'])
+def bulk_moderate(queue):
+    """Approve or reject many queued products/farmers at once.
+
+    Takes JSON {"action": "approve"|"reject", "ids": [...]} or the same as
+    form fields, and answers with JSON rather than re-rendering the dashboard.
+    """
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify(error='Admin login required.'), 403
+    
+    if request.is_json:
+        data = request.get_json(silent=True) or {}
+        action, ids = data.get('action'), data.get('ids')
+    else:
+        action, ids = request.form.get('action'), request.form.getlist('ids')
+    if action not in MODERATION_ACTIONS[queue]:
+        return jsonify(error='action must be "approve" or "reject".'), 400
+    try:
+        ids = parse_ids(ids or [])
+    except (TypeError, ValueError) as e:
+        return jsonify(error=f'Invalid ids: {e}'), 400
+    
+    done, skipped = MODERATION_ACTIONS[queue][action](ids)
+    db.session.commit()
+    if done:
+        invalidate_catalog()
+    stats = admin_dashboard_stats()
+    return jsonify(queue=queue, action=action, done=done, skipped=skipped,
+                   pending_products=stats['pending_products'],
+                   pending_farmers=stats['pending_farmers'])
+
+@admin.route('/approve_product/<int:id>')
+def approve_product(id):
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    product = Product.query.get_or_404(id)
+    product.approved = True
+    db.session.commit()
+    invalidate_catalog()
+    flash('Product approved', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
+
+@admin.route('/reject_product/<int:id>')
+def reject_product(id):
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    product = Product.query.get_or_404(id)
+    db.session.delete(product)
+    db.session.commit()
+    invalidate_catalog()
+    flash('Product rejected and deleted', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
+
+@admin.route('/admin/export_orders')
+def export_orders_download():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    fmt = request.args.get('format', 'csv')
+    try:
+        start = parse_date(request.args.get('start'))
+        end = parse_date(request.args.get('end'))
+    except ValueError:
+        flash('Dates must be in YYYY-MM-DD format.', 'error')
+        return redirect(url_for('admin.admin_dashboard'))
+    if fmt not in EXPORT_FORMATS:
+        flash('Unknown export format.', 'error')
+        return redirect(url_for('admin.admin_dashboard'))
+    farmer_id = request.args.get('farmer', type=int)
+    
+    # Compress on the fly for clients that accept it; the browser saves plain CSV/JSONL
+    gzip = 'gzip' in request.accept_encodings
+    chunks = export_orders(fmt, start, end, farmer_id, gzip=gzip)
+    response = current_app.response_class(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt])
+    filename = f"orders-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['Cache-Control'] = 'private, no-store'
+    response.vary.add('Accept-Encoding')
+    if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+@admin.route('/admin/add_category', methods=['POST'])
+def add_category():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    name = request.form['name']
+    if Category.query.filter_by(name=name).first():
+        flash('Category already exists', 'error')
+        return redirect(url_for('admin.admin_dashboard'))
+    
+    category = Category(name=name)
+    db.session.add(category)
+    db.session.commit()
+    invalidate_catalog()
+    flash('Category added successfully!', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
+
+@admin.route('/admin/delete_category/<int:id>')
+def delete_category(id):
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    category = Category.query.get_or_404(id)
+    db.session.delete(category)
+    db.session.commit()
+    invalidate_catalog()
+    flash('Category deleted successfully!', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
+
+@admin.route('/admin/approve_farmer/<int:user_id>')
+def approve_farmer(user_id):
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    farmer = User.query.get_or_404(user_id)
+    if farmer.role_name != 'farmer':
+        flash('User is not a farmer.', 'error')
+        return redirect(url_for('admin.admin_dashboard'))
+    
+    farmer.is_approved = True
+    db.session.commit()
+    invalidate_catalog()
+    flash(f'Farmer "{farmer.name}" has been approved! They can now log in.', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
+
+@admin.route('/admin/delete_user/<int:user_id>')
+def delete_user(user_id):
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('auth.login'))
+    
+    # Prevent admin from deleting themselves
+    if user_id == session['user_id']:
+        flash('You cannot delete your own account!', 'error')
+        return redirect(url_for('admin.admin_dashboard'))
+    
+    user = User.query.get_or_404(user_id)
+    
+    # Additional safety checks
+    if user.role_name == 'admin':
+        flash('Cannot delete other admin accounts!', 'error')
+        return redirect(url_for('admin.admin_dashboard'))
+    
+    try:
+        # Delete user's products if they are a farmer
+        if user.role_name == 'farmer':
+            # First delete all products associated with this farmer
+            Product.query.filter_by(farmer_id=user_id).delete()
+        
+        # Delete the user
+        db.session.delete(user)
+        db.session.commit()
+    except IntegrityError:
+        # Foreign keys are enforced (see sqlite_profile.py), so rows that
+        # orders still point at can't be removed
+        db.session.rollback()
+        flash(f'User "{user.name}" has orders on record and cannot be deleted.', 'error')
+        return redirect(url_for('admin.admin_dashboard'))
+    invalidate_catalog()
+    
+    flash(f'User "{user.name}" has been deleted successfully!', 'success')
+    return redirect(url_for('admin.admin_dashboard'))
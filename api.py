@@ -0,0 +1,184 @@
+# api.py
+# Read-only JSON API over the public catalog, mounted at /api/v1.
+#
+# Listing endpoints select plain columns rather than ORM objects, and only
+# the columns the client asks for: ?fields=id,name,price narrows both the
+# SELECT and the JSON. Products are paged with the same keyset cursors as
+# the HTML catalog (?limit=, ?after=, ?before=) and accept its ?search= and
+# ?category= filters, plus ?farmer=.
+#
+# The encoded (and, when the client accepts it, gzipped) body is kept in
+# the catalog cache, so a repeat request is a dict lookup; ETags come from
+# the cache version as for the HTML pages, and a matching If-None-Match is
+# answered before any of that.
+import gzip
+import json
+
+from flask import Blueprint, Response, abort, jsonify, request
+from sqlalchemy.orm import aliased
+from werkzeug.exceptions import HTTPException
+
+from catalog import cached, get_categories, get_farmer_profile
+from httpcache import conditional_resource
+from models import Category, Product, User
+from pagination import page_args, paginate_request
+from search import catalog_sort_keys, search_products
+from uploads import upload_url
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+GZIP_MIN_SIZE = 1024  # Smaller bodies aren't worth compressing
+
+_farmer = aliased(User)
+
+# field name -> (column, join it needs)
+PRODUCT_FIELDS = {
+    'id': (Product.id, None),
+    'name': (Product.name, None),
+    'description': (Product.description, None),
+    'price': (Product.price, None),
+    'quantity': (Product.quantity, None),
+    'sku': (Product.sku, None),
+    'image': (Product.image, None),
+    'category_id': (Product.category_id, None),
+    'category': (Category.name, 'category'),
+    'farmer_id': (Product.farmer_id, None),
+    'farmer_name': (_farmer.name, 'farmer'),
+    'farm_name': (_farmer.farm_name, 'farmer'),
+    'updated_at': (Product.updated_at, None),
+}
+
+FARMER_FIELDS = ('id', 'name', 'farm_name', 'location', 'bio', 'profile_picture')
+
+
+@api.errorhandler(HTTPException)
+def api_error(e):
+    response = jsonify(error={'status': e.code, 'message': e.description})
+    response.status_code = e.code
+    return response
+
+
+@api.after_request
+def vary_on_encoding(response):
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _encoding():
+    return 'gzip' if request.accept_encodings['gzip'] else 'identity'
+
+
+def _json_response(key, build):
+    """Serve build()'s payload as JSON, encoded once per cache version."""
+    encoding = _encoding()
+
+    def encode():
+        body = json.dumps(build(), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        if encoding == 'gzip' and len(body) >= GZIP_MIN_SIZE:
+            return gzip.compress(body, compresslevel=6), 'gzip'
+        return body, None
+
+    body, content_encoding = cached(('api',) + key + (encoding,), encode)
+    response = Response(body, mimetype='application/json')
+    if content_encoding:
+        response.headers['Content-Encoding'] = content_encoding
+    return response
+
+
+def parse_fields(value, allowed):
+    """The requested field names, in the order given; 400 on unknown names."""
+    if not value:
+        return list(allowed)
+    fields = list(dict.fromkeys(f.strip() for f in value.split(',') if f.strip()))
+    if not fields:
+        abort(400, 'fields= names no fields')
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        abort(400, f"Unknown field(s) {', '.join(unknown)}; choose from {', '.join(allowed)}")
+    return fields
+
+
+def _int_arg(name):
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        abort(400, f'{name}= must be an integer')
+
+
+def _image_url(filename):
+    return upload_url('products', filename) if filename else None
+
+
+def _product_rows(rows, fields):
+    data = []
+    for row in rows:
+        record = dict(zip(fields, row))
+        if 'image' in record:
+            record['image'] = _image_url(record['image'])
+        if record.get('updated_at') is not None:
+            record['updated_at'] = record['updated_at'].isoformat()
+        data.append(record)
+    return data
+
+
+def _page_payload(data, page):
+    return {
+        'data': data,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'limit': page.limit,
+    }
+
+
+@api.route('/products')
+@conditional_resource(_encoding)
+def products():
+    search = request.args.get('search', '').strip()
+    category_id = _int_arg('category')
+    farmer_id = _int_arg('farmer')
+    fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+
+    def build():
+        query = search_products(search, category_id)
+        if farmer_id is not None:
+            query = query.filter(Product.farmer_id == farmer_id)
+        joins = {PRODUCT_FIELDS[f][1] for f in fields}
+        if 'category' in joins:
+            query = query.outerjoin(Category, Category.id == Product.category_id)
+        if 'farmer' in joins:
+            query = query.join(_farmer, _farmer.id == Product.farmer_id)
+        query = query.with_entities(*[PRODUCT_FIELDS[f][0] for f in fields])
+        page = paginate_request(query, catalog_sort_keys(search))
+        items = [(item,) if len(fields) == 1 else item for item in page.items]
+        return _page_payload(_product_rows(items, fields), page)
+
+    _, _, limit = page_args()
+    key = ('products', search, category_id, farmer_id, tuple(fields),
+           request.args.get('after'), request.args.get('before'), limit)
+    return _json_response(key, build)
+
+
+@api.route('/farmers/<int:farmer_id>')
+@conditional_resource(_encoding)
+def farmer(farmer_id):
+    profile = get_farmer_profile(farmer_id)
+    if profile is None or profile['role']['name'] != 'farmer' or not profile['is_approved']:
+        abort(404, 'No such farmer.')
+    fields = parse_fields(request.args.get('fields'), FARMER_FIELDS)
+
+    def build():
+        record = {f: profile[f] for f in fields}
+        if record.get('profile_picture'):
+            record['profile_picture'] = upload_url('profiles', record['profile_picture'])
+        return {'data': record}
+
+    return _json_response(('farmer', farmer_id, tuple(fields)), build)
+
+
+@api.route('/categories')
+@conditional_resource(_encoding)
+def categories():
+    return _json_response(('categories',), lambda: {'data': get_categories()})
@@ -0,0 +1,241 @@
+# assets.py
+# Static asset bundles, vendored icon fonts and response compression.
+#
+# BUNDLES concatenates the site's CSS and JS into static/dist/ under
+# content-hash names (site.3f9c0a1b2d4e.css) next to a gzipped copy, and
+# records logical -> built name in static/dist/manifest.json. Templates
+# link them with asset_url('css/site.css'), which takes the same filename
+# url_for('static', ...) does. Bundles are rebuilt at startup when a source
+# is newer than the manifest; `flask build-assets` does it up front.
+#
+# The icon fonts are vendored into static/vendor/<package>-<version>/ by
+# `flask build-assets --vendor`, which downloads each stylesheet and the
+# font files it references. Until then vendor_url() links the CDN copy.
+#
+# Hashed bundles, vendored files and static URLs carrying the current
+# ?v=<digest> are served as immutable for a year; everything else must
+# revalidate. A client that accepts gzip gets the precompressed .gz sibling
+# when there is one, and HTML pages are gzipped on the way out.
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import tempfile
+from urllib.parse import urljoin
+
+from flask import current_app, request, send_from_directory, url_for
+
+from uploads import file_digest
+
+BUNDLES = {
+    'css/site.css': ['css/styles.css', 'css/base.css'],
+    'js/site.js': ['js/base.js'],
+    'css/admin.css': ['css/admin.css'],
+    'js/admin.js': ['js/admin.js'],
+}
+
+# name -> (version, package root URL, stylesheet path under the root)
+VENDOR = {
+    'fontawesome': ('6.4.0', 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/',
+                    'css/all.min.css'),
+    'bootstrap-icons': ('1.10.0', 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.0/',
+                        'font/bootstrap-icons.css'),
+}
+
+DIST = 'dist'
+MANIFEST = 'dist/manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.ttf', '.eot', '.json')
+TEMP_PREFIX = '.build-'  # Files being written; builds never prune these
+IMMUTABLE = 'public, max-age={max_age}, immutable'
+
+_CSS_URL_RE = re.compile(r'url\(\s*[\'"]?([^\'")]+)[\'"]?\s*\)')
+
+_manifest = {}
+
+
+def _static(path=''):
+    return os.path.join(current_app.static_folder, path)
+
+
+def _replace(path, data):
+    # A temp file of its own per writer: every worker builds at startup, and a
+    # shared name would let two of them interleave writes before the rename
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), prefix=TEMP_PREFIX, delete=False) as f:
+        f.write(data)
+    os.chmod(f.name, 0o644)  # NamedTemporaryFile creates it 0600
+    os.replace(f.name, path)
+
+
+def _write(path, data):
+    """Write atomically, plus a .gz sibling for compressible files."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _replace(path, data)
+    if path.endswith(COMPRESSIBLE):
+        # mtime=0 keeps the .gz byte-identical between builds
+        _replace(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+
+
+def _sources_mtime():
+    return max(os.path.getmtime(_static(source))
+               for sources in BUNDLES.values() for source in sources)
+
+
+def build_assets():
+    """Build every bundle and write the manifest; returns the manifest."""
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        parts = []
+        for source in sources:
+            with open(_static(source), 'rb') as f:
+                parts.append(f.read().rstrip() + b'\n')
+        data = b'\n'.join(parts)
+        stem, extension = os.path.splitext(os.path.basename(name))
+        built = f'{DIST}/{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}'
+        if not os.path.exists(_static(built)):
+            _write(_static(built), data)
+        manifest[name] = built
+
+    # Drop outputs of earlier builds
+    current = set(manifest.values())
+    for filename in os.listdir(_static(DIST)):
+        path = f'{DIST}/{filename}'
+        # Another worker's build may be writing its temp files right now
+        if filename.startswith(TEMP_PREFIX) or path.removesuffix('.gz') in current | {MANIFEST}:
+            continue
+        try:
+            os.unlink(_static(path))
+        except FileNotFoundError:
+            pass  # Pruned by another worker
+
+    _write(_static(MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+    _manifest.clear()
+    _manifest.update(manifest)
+    return manifest
+
+
+def load_manifest(rebuild_stale=True):
+    path = _static(MANIFEST)
+    if not os.path.exists(path) or (rebuild_stale and os.path.getmtime(path) < _sources_mtime()):
+        return build_assets()
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    _manifest.clear()
+    _manifest.update(manifest)
+    return manifest
+
+
+def asset_url(filename, **values):
+    """url_for('static', filename=...) that links the hashed bundle for a
+    BUNDLES name, and adds ?v=<content digest> to any other static file."""
+    built = _manifest.get(filename)
+    if built is not None:
+        return url_for('static', filename=built, **values)
+    version = file_digest(_static(filename))
+    if version is not None:
+        values['v'] = version
+    return url_for('static', filename=filename, **values)
+
+
+def _vendor_dir(name):
+    return f'vendor/{name}-{VENDOR[name][0]}'
+
+
+def vendor_url(name):
+    """Local URL of a vendored stylesheet, or its CDN URL if not vendored yet."""
+    _, root, stylesheet = VENDOR[name]
+    local = f'{_vendor_dir(name)}/{stylesheet}'
+    if os.path.exists(_static(local)):
+        return url_for('static', filename=local)
+    return root + stylesheet
+
+
+def _fetch(url):
+    import urllib.request  # Only `flask build-assets --vendor` downloads anything
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read()
+
+
+def vendor_assets(force=False):
+    """Download each VENDOR stylesheet and the files it references; returns
+    the paths written."""
+    written = []
+    for name, (_, root, stylesheet) in VENDOR.items():
+        folder = _vendor_dir(name)
+        if os.path.exists(_static(f'{folder}/{stylesheet}')) and not force:
+            continue
+        css_url = root + stylesheet
+        css = _fetch(css_url)
+        for ref in sorted(set(_CSS_URL_RE.findall(css.decode('utf-8')))):
+            if ref.startswith('data:'):
+                continue
+            url = urljoin(css_url, ref)
+            url = url.split('#', 1)[0].split('?', 1)[0]
+            if not url.startswith(root):
+                raise ValueError(f'{name}: {ref} points outside {root}')
+            relative = url[len(root):]
+            if relative not in written:
+                _write(_static(f'{folder}/{relative}'), _fetch(url))
+                written.append(f'{folder}/{relative}')
+        _write(_static(f'{folder}/{stylesheet}'), css)
+        written.append(f'{folder}/{stylesheet}')
+    return written
+
+
+def _immutable(filename):
+    if filename.startswith((DIST + '/', 'vendor/')):
+        return True
+    version = request.args.get('v')
+    return version is not None and version == file_digest(_static(filename))
+
+
+def serve_static(filename):
+    """Replacement for Flask's static view: immutable caching and .gz siblings."""
+    folder = current_app.static_folder
+    compressed = os.path.isfile(os.path.join(folder, filename + '.gz')) \
+        and '..' not in filename.split('/')
+    if compressed and request.accept_encodings['gzip']:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(folder, filename + '.gz', mimetype=mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = send_from_directory(folder, filename)
+    if compressed:
+        response.vary.add('Accept-Encoding')
+    if _immutable(filename):
+        response.headers['Cache-Control'] = IMMUTABLE.format(
+            max_age=current_app.config.get('ASSETS_MAX_AGE', 31536000))
+    return response
+
+
+def compress_html(response):
+    """Gzip HTML responses for clients that accept it."""
+    if response.mimetype != 'text/html':
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or not request.accept_encodings['gzip']):
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config.get('COMPRESS_MIN_SIZE', 1024):
+        return response
+    response.set_data(gzip.compress(data, compresslevel=current_app.config.get('COMPRESS_LEVEL', 6)))
+    response.headers['Content-Encoding'] = 'gzip'
+    # Same content, different bytes: only a weak validator still holds
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_assets(app):
+    with app.app_context():
+        os.makedirs(_static(DIST), exist_ok=True)
+        load_manifest(rebuild_stale=app.config.get('ASSETS_AUTO_BUILD', True))
+    app.view_functions['static'] = serve_static
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.jinja_env.globals['vendor_url'] = vendor_url
+    if app.config.get('COMPRESS_HTML', True):
+        app.after_request(compress_html)
@@ -0,0 +1,187 @@
+# auth.py
+# Sign-in, registration and the signed-in user's own profile.
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+
+from catalog import invalidate_catalog
+from extensions import db
+from identity import get_current_user
+from images import store_image
+from models import User, role_map
+from passwords import HasherBusy
+from storage import UploadRejected, accepts_uploads, allowed_file, store_upload
+
+auth = Blueprint('auth', __name__)
+
+@auth.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        email = request.form['email']
+        password = request.form['password']
+        user = User.query.filter_by(email=email).first()
+        try:
+            valid = user is not None and user.check_password(password)
+        except HasherBusy:
+            flash('We are receiving too many sign-in requests right now. Please try again in a moment.', 'error')
+            return render_template('login.html'), 503
+        if valid and user.password_needs_rehash():
+            # Cost factor changed since this hash was made; upgrade it now,
+            # or at the next login if the hasher is busy
+            try:
+                user.set_password(password)
+                db.session.commit()
+            except HasherBusy:
+                pass
+        if valid:
+            # --- NEW: CHECK IF FARMER IS APPROVED ---
+            if user.role_name == 'farmer' and not user.is_approved:
+                flash('Your farmer account is pending admin approval. You will be notified once approved.', 'warning')
+                return redirect(url_for('auth.login'))
+            # --- END OF NEW CHECK ---
+            
+            session['user_id'] = user.id
+            session['role'] = user.role_name
+            session['user_name'] = user.name
+            flash('Login successful!', 'success')
+            if user.role_name == 'farmer':
+                return redirect(url_for('farmers.farmer_dashboard'))
+            elif user.role_name == 'admin':
+                return redirect(url_for('admin.admin_dashboard'))
+            else:
+                return redirect(url_for('shop.customer_dashboard'))
+        flash('Invalid credentials', 'error')
+    return render_template('login.html')
+
+@auth.route('/register', methods=['GET', 'POST'])
+@accepts_uploads('licenses', 'profiles')
+def register():
+    if request.method == 'POST':
+        name = request.form['name']
+        email = request.form['email']
+        password = request.form['password']
+        phone = request.form['phone']
+        role_name = request.form['role']
+        
+        # Check if email already exists
+        if User.query.filter_by(email=email).first():
+            flash('Email already registered', 'error')
+            return redirect(url_for('auth.register'))
+        
+        role_id = role_map.id(role_name)
+        if not role_id:
+            flash('Invalid role', 'error')
+            return redirect(url_for('auth.register'))
+        
+        # Auto-approve customers, but not farmers
+        is_approved = True if role_name == 'customer' else False
+
+        user = User(
+            name=name, 
+            email=email, 
+            phone=phone, 
+            role_id=role_id,
+            is_approved=is_approved  # Set approval status
+        )
+        try:
+            user.set_password(password)
+        except HasherBusy:
+            flash('We are receiving too many requests right now. Please try again in a moment.', 'error')
+            return redirect(url_for('auth.register'))
+        
+        # Add farm details and handle license if farmer
+        if role_name == 'farmer':
+            user.farm_name = request.form.get('farm_name')
+            user.location = request.form.get('location')
+
+            # Handle License Upload (MANDATORY for farmers)
+            if 'license_doc' in request.files:
+                file = request.files['license_doc']
+                if file and file.filename != '' and allowed_file(file.filename):
+                    try:
+                        user.license_filename = store_upload('licenses', file) # Save filename to the user
+                    except UploadRejected as e:
+                        flash(f'License document: {e}', 'error')
+                        return redirect(url_for('auth.register'))
+                else:
+                    flash('A valid license document is required for farmer registration.', 'error')
+                    return redirect(url_for('auth.register'))
+            else:
+                flash('License document is required for farmer registration.', 'error')
+                return redirect(url_for('auth.register'))
+            
+            # Handle Profile Picture Upload for farmers
+            if 'profile_picture' in request.files:
+                file = request.files['profile_picture']
+                if file and file.filename != '' and allowed_file(file.filename):
+                    try:
+                        filename = store_image('profiles', file)
+                    except UploadRejected as e:
+                        flash(f'Profile picture: {e}', 'error')
+                        return redirect(url_for('auth.register'))
+                    user.profile_picture = filename # Save filename to the user
+                else:
+                    flash('A valid profile picture is required for farmer registration.', 'error')
+                    return redirect(url_for('auth.register'))
+        
+        db.session.add(user)
+        db.session.commit()
+
+        # Different success messages based on role
+        if role_name == 'farmer':
+            flash('Registration successful! Your farmer account is pending admin approval. You will be able to log in once approved.', 'success')
+        else:
+            flash('Registration successful! Please log in.', 'success')
+        return redirect(url_for('auth.login'))
+    
+    return render_template('register.html', roles=role_map.all())
+
+@auth.route('/profile')
+def profile():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    user = get_current_user()
+    return render_template('profile.html', user=user)
+
+@auth.route('/edit_profile', methods=['GET', 'POST'])
+@accepts_uploads('profiles')
+def edit_profile():
+    if 'user_id' not in session:
+        return redirect(url_for('auth.login'))
+    
+    user = get_current_user()
+    
+    if request.method == 'POST':
+        user.name = request.form['name']
+        user.email = request.form['email']
+        user.phone = request.form['phone']
+        user.bio = request.form['bio']
+        user.address = request.form['address']
+        
+        # Add farm details if farmer
+        if session['role'] == 'farmer':
+            user.farm_name = request.form.get('farm_name')
+            user.location = request.form.get('location')
+        
+        # Handle profile picture upload
+        if 'profile_picture' in request.files:
+            file = request.files['profile_picture']
+            if file and file.filename != '' and allowed_file(file.filename):
+                try:
+                    filename = store_image('profiles', file)
+                except UploadRejected as e:
+                    flash(str(e), 'error')
+                    return redirect(url_for('auth.edit_profile'))
+                user.profile_picture = filename
+        
+        db.session.commit()
+        if session['role'] == 'farmer':
+            invalidate_catalog()
+        flash('Profile updated successfully!', 'success')
+        return redirect(url_for('auth.profile'))
+    
+    return render_template('edit_profile.html', user=user)
+
+@auth.route('/logout')
+def logout():
+    session.clear()
+    flash('Logged out successfully', 'success')
+    return redirect(url_for('auth.login'))
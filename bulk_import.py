@@ -0,0 +1,182 @@
+# bulk_import.py
+# Bulk product import from CSV or JSON Lines.
+#
+# Rows are read one at a time from the stream, validated, and written in
+# chunks: one executemany INSERT .. ON CONFLICT per chunk, committed as its
+# own transaction. A bad row is reported with its line number and skipped;
+# it never aborts the rest of the file.
+#
+# Products are keyed on (farmer_id, sku), so importing the same file twice
+# leaves the catalog unchanged. A row whose SKU already exists updates that
+# product only if something differs, and like update_product that sends it
+# back for admin approval.
+#
+# Columns: sku, name, price, quantity (required); description, category
+# (a category name or id; optional).
+import csv
+import json
+import math
+from datetime import datetime
+from importlib import import_module
+
+from sqlalchemy import or_
+
+from extensions import db
+from models import Category, Product
+
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+# Dialects whose insert() has ON CONFLICT; imported on first use, since
+# loading the PostgreSQL one costs startup time on SQLite deployments
+_INSERTS = {
+    'sqlite': 'sqlalchemy.dialects.sqlite',
+    'postgresql': 'sqlalchemy.dialects.postgresql',
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0   # Rows written (new or changed) or already up to date
+        self.failed = 0
+        self.errors = []    # (line, message), the first MAX_REPORTED_ERRORS of them
+
+    def error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def guess_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension in ('jsonl', 'ndjson'):
+        return 'jsonl'
+    if extension == 'csv':
+        return 'csv'
+    return None
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, row dict or None, error) from a binary stream.
+
+    Lines are decoded one at a time, so text that isn't UTF-8 (or CSV that
+    can't be parsed) is reported on the line where it fails; nothing after
+    that line is read.
+    """
+    position = {'line': 0}
+
+    def lines():
+        for number, raw in enumerate(stream, start=1):
+            position['line'] = number
+            yield raw.decode('utf-8-sig' if number == 1 else 'utf-8')
+
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(lines())
+            for row in reader:
+                yield reader.line_num, row, None
+        elif fmt == 'jsonl':
+            for number, line in enumerate(lines(), start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield number, None, f'invalid JSON ({e})'
+                    continue
+                if not isinstance(row, dict):
+                    yield number, None, 'expected a JSON object'
+                    continue
+                yield number, row, None
+    except (UnicodeDecodeError, csv.Error) as e:
+        # The rest of the file can't be read; rows before this line still count
+        yield position['line'], None, f'unreadable from here on ({e})'
+
+
+def _clean(row, farmer_id, categories, now):
+    """Validated column values for one row; raises ValueError with the reason."""
+    def field(name):
+        value = row.get(name)
+        return str(value).strip() if value is not None else ''
+
+    sku = field('sku')
+    name = field('name')
+    if not sku:
+        raise ValueError('sku is required')
+    if not name:
+        raise ValueError('name is required')
+    if len(sku) > 64 or len(name) > 100:
+        raise ValueError('sku or name is too long')
+    try:
+        price = float(field('price'))
+        quantity = int(field('quantity'))
+    except ValueError:
+        raise ValueError('price and quantity must be numbers')
+    if not math.isfinite(price) or price < 0 or quantity < 0:
+        raise ValueError('price and quantity cannot be negative')
+
+    category_id = None
+    category = field('category')
+    if category:
+        category_id = categories.get(category.lower())
+        if category_id is None:
+            raise ValueError(f'unknown category {category!r}')
+
+    return {
+        'farmer_id': farmer_id,
+        'sku': sku,
+        'name': name,
+        'description': field('description') or None,
+        'price': price,
+        'quantity': quantity,
+        'category_id': category_id,
+        'approved': False,
+        'updated_at': now,
+    }
+
+
+def _upsert_statement():
+    insert = import_module(_INSERTS[db.engine.dialect.name]).insert
+    stmt = insert(Product.__table__)
+    new = stmt.excluded
+    changed = or_(*(getattr(Product, c).is_distinct_from(getattr(new, c))
+                    for c in ('name', 'description', 'price', 'quantity', 'category_id')))
+    return stmt.on_conflict_do_update(
+        index_elements=['farmer_id', 'sku'],
+        set_={c: getattr(new, c) for c in ('name', 'description', 'price', 'quantity',
+                                           'category_id', 'approved', 'updated_at')},
+        where=changed,
+    )
+
+
+def import_products(stream, farmer_id, fmt, chunk_size=CHUNK_SIZE):
+    """Import products for one farmer from a binary stream; returns ImportResult."""
+    categories = {}
+    for category in Category.query:
+        categories[category.name.lower()] = category.id
+        categories[str(category.id)] = category.id
+    stmt = _upsert_statement()
+    result = ImportResult()
+    now = datetime.utcnow()
+    batch = []
+
+    def flush():
+        db.session.execute(stmt, batch)
+        db.session.commit()
+        result.imported += len(batch)
+        batch.clear()
+
+    for line, row, error in read_rows(stream, fmt):
+        if error is None:
+            try:
+                batch.append(_clean(row, farmer_id, categories, now))
+            except ValueError as e:
+                error = str(e)
+        if error is not None:
+            result.error(line, error)
+        if len(batch) >= chunk_size:
+            flush()
+    if batch:
+        flush()
+    return result
@@ -0,0 +1,128 @@
+# cache.py
+# Bounded in-process LRU/TTL cache for catalog read models.
+#
+# Values are plain dicts/lists (never ORM objects) so they can outlive the
+# request and session that built them. Every entry is stamped with the
+# cache's version when stored; bump() moves the version on, which turns all
+# older entries into misses at once without having to know their keys. A
+# value is stamped with the version read before it was built, and dropped
+# if a bump() came in while it was being built, since it may predate the
+# write that caused it.
+#
+# The cache lives inside one process. With several workers each one has its
+# own copy; sync() lets them follow a version kept in the database (see
+# catalog.py), so another worker's write shows up on the next request.
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class ReadModelCache:
+    def __init__(self, app=None, config_prefix='CATALOG_CACHE'):
+        self.config_prefix = config_prefix
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (version, expires_at, size, value)
+        self._bytes = 0
+        self.version = 0
+        self.bumped_at = time.time()
+        self.max_entries = 512
+        self.max_bytes = 32 * 1024 * 1024
+        self.ttl = 60
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        prefix = self.config_prefix
+        self.max_entries = app.config.get(prefix + '_MAX_ENTRIES', self.max_entries)
+        self.max_bytes = app.config.get(prefix + '_MAX_BYTES', self.max_bytes)
+        self.ttl = app.config.get(prefix + '_TTL', self.ttl)
+        app.extensions[prefix.lower()] = self
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key):
+        """Return the cached value, or None when missing, expired or stale."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            version, expires_at, _, value = entry
+            if version != self.version or expires_at <= time.monotonic():
+                self._discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, version=None):
+        """Store `value`; `version` is the cache version it was built under
+        (default: the current one). Stale versions are not stored."""
+        if not self.enabled:
+            return
+        size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if version is None:
+                version = self.version
+            elif version != self.version:
+                return
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (version, time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def get_or_build(self, key, build):
+        version = self.version
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.set(key, value, version)
+        return value
+
+    def bump(self):
+        """Invalidate everything currently cached."""
+        with self._lock:
+            self.version += 1
+            self.bumped_at = time.time()
+
+    def sync(self, version, bumped_at):
+        """Adopt a version kept elsewhere; entries stored under any other
+        version become misses."""
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self.bumped_at = bumped_at
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'bumped_at': self.bumped_at,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def _discard(self, key):
+        _, _, size, _ = self._entries.pop(key)
+        self._bytes -= size
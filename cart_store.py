@@ -0,0 +1,271 @@
+# cart_store.py
+# Server-side shopping carts.
+#
+# The session cookie only carries an opaque cart id; the lines live in a
+# CartStore. Each line keeps the product name and price from when it was
+# added, so showing the cart needs no product queries. Prices are checked
+# again at checkout.
+#
+# The SQL backend sums the total and item count from the lines it loads
+# rather than trusting carts.total / item_count: deleting a product removes
+# its cart_items rows through ON DELETE CASCADE, behind the running totals'
+# back.
+#
+# Backends:
+#   'sql'    - carts / cart_items tables (default)
+#   'memory' - a dict in this process, for tests and single-process dev
+import secrets
+import threading
+from datetime import datetime, timedelta
+
+from flask import session
+
+from extensions import db
+from models import Cart, CartItem
+
+
+class CartStore:
+    """Interface shared by the cart backends.
+
+    `product` arguments only need .id, .name and .price.
+    """
+
+    def get(self, cart_id):
+        """Return {'items': [...], 'total': float, 'item_count': int}."""
+        raise NotImplementedError
+
+    def lines(self, cart_id):
+        """Return {product_id: quantity}."""
+        raise NotImplementedError
+
+    def add(self, cart_id, product, quantity=1):
+        raise NotImplementedError
+
+    def set_quantity(self, cart_id, product_id, quantity):
+        """Set a line's quantity; quantities below 1 remove the line."""
+        raise NotImplementedError
+
+    def remove(self, cart_id, product_id, quantity=1):
+        raise NotImplementedError
+
+    def clear(self, cart_id):
+        raise NotImplementedError
+
+    def purge_abandoned(self, older_than):
+        """Delete carts untouched since `older_than`; returns how many."""
+        raise NotImplementedError
+
+
+def _line(product_id, name, unit_price, quantity):
+    return {
+        'product': {'id': product_id, 'name': name, 'price': unit_price},
+        'quantity': quantity,
+        'line_total': unit_price * quantity,
+    }
+
+
+def _empty():
+    return {'items': [], 'total': 0, 'item_count': 0}
+
+
+class SQLCartStore(CartStore):
+    def get(self, cart_id):
+        cart = db.session.get(Cart, cart_id) if cart_id else None
+        if cart is None:
+            return _empty()
+        items = [_line(i.product_id, i.name, i.unit_price, i.quantity) for i in cart.items]
+        return {'items': items, 'total': sum(line['line_total'] for line in items),
+                'item_count': sum(line['quantity'] for line in items)}
+
+    def lines(self, cart_id):
+        if not cart_id:
+            return {}
+        rows = db.session.query(CartItem.product_id, CartItem.quantity) \
+            .filter(CartItem.cart_id == cart_id)
+        return {product_id: quantity for product_id, quantity in rows}
+
+    def add(self, cart_id, product, quantity=1):
+        cart = db.session.get(Cart, cart_id)
+        if cart is None:
+            cart = Cart(id=cart_id, total=0, item_count=0)
+            db.session.add(cart)
+        item = db.session.get(CartItem, (cart_id, product.id))
+        if item is None:
+            db.session.add(CartItem(cart_id=cart_id, product_id=product.id, quantity=quantity,
+                                    name=product.name, unit_price=product.price))
+            cart.total += product.price * quantity
+        else:
+            # Re-adding refreshes the cached price for the whole line
+            cart.total += product.price * (item.quantity + quantity) - item.unit_price * item.quantity
+            item.quantity += quantity
+            item.name = product.name
+            item.unit_price = product.price
+        cart.item_count += quantity
+        cart.updated_at = datetime.utcnow()
+        db.session.commit()
+
+    def set_quantity(self, cart_id, product_id, quantity):
+        item = db.session.get(CartItem, (cart_id, product_id))
+        if item is None:
+            return
+        self._change(item, quantity - item.quantity)
+
+    def remove(self, cart_id, product_id, quantity=1):
+        item = db.session.get(CartItem, (cart_id, product_id))
+        if item is None:
+            return
+        self._change(item, -min(quantity, item.quantity))
+
+    def _change(self, item, delta):
+        cart = item.cart
+        cart.total += item.unit_price * delta
+        cart.item_count += delta
+        cart.updated_at = datetime.utcnow()
+        item.quantity += delta
+        if item.quantity < 1:
+            db.session.delete(item)
+        if cart.item_count < 1:
+            cart.total = 0  # Don't let float rounding leave a few paise behind
+        db.session.commit()
+
+    def clear(self, cart_id):
+        CartItem.query.filter_by(cart_id=cart_id).delete()
+        Cart.query.filter_by(id=cart_id).delete()
+        db.session.commit()
+
+    def purge_abandoned(self, older_than):
+        stale = db.select(Cart.id).where(Cart.updated_at < older_than)
+        CartItem.query.filter(CartItem.cart_id.in_(stale)).delete(synchronize_session=False)
+        count = Cart.query.filter(Cart.updated_at < older_than).delete(synchronize_session=False)
+        db.session.commit()
+        return count
+
+
+class MemoryCartStore(CartStore):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._carts = {}
+
+    def _cart(self, cart_id):
+        cart = self._carts.get(cart_id)
+        if cart is None:
+            cart = self._carts[cart_id] = {'items': {}, 'total': 0, 'item_count': 0}
+        cart['updated_at'] = datetime.utcnow()
+        return cart
+
+    def get(self, cart_id):
+        with self._lock:
+            cart = self._carts.get(cart_id)
+            if cart is None:
+                return _empty()
+            items = [_line(pid, name, price, qty)
+                     for pid, (name, price, qty) in cart['items'].items()]
+            return {'items': items, 'total': cart['total'], 'item_count': cart['item_count']}
+
+    def lines(self, cart_id):
+        with self._lock:
+            cart = self._carts.get(cart_id)
+            return {pid: line[2] for pid, line in cart['items'].items()} if cart else {}
+
+    def add(self, cart_id, product, quantity=1):
+        with self._lock:
+            cart = self._cart(cart_id)
+            _, old_price, old_quantity = cart['items'].get(product.id, (None, 0, 0))
+            new_quantity = old_quantity + quantity
+            cart['items'][product.id] = (product.name, product.price, new_quantity)
+            cart['total'] += product.price * new_quantity - old_price * old_quantity
+            cart['item_count'] += quantity
+
+    def set_quantity(self, cart_id, product_id, quantity):
+        with self._lock:
+            cart = self._carts.get(cart_id)
+            if cart and product_id in cart['items']:
+                self._change(cart, product_id, quantity - cart['items'][product_id][2])
+
+    def remove(self, cart_id, product_id, quantity=1):
+        with self._lock:
+            cart = self._carts.get(cart_id)
+            if cart and product_id in cart['items']:
+                self._change(cart, product_id, -min(quantity, cart['items'][product_id][2]))
+
+    def _change(self, cart, product_id, delta):
+        name, price, quantity = cart['items'][product_id]
+        cart['total'] += price * delta
+        cart['item_count'] += delta
+        cart['updated_at'] = datetime.utcnow()
+        if quantity + delta < 1:
+            del cart['items'][product_id]
+        else:
+            cart['items'][product_id] = (name, price, quantity + delta)
+        if cart['item_count'] < 1:
+            cart['total'] = 0
+
+    def clear(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+    def purge_abandoned(self, older_than):
+        with self._lock:
+            stale = [cid for cid, cart in self._carts.items() if cart['updated_at'] < older_than]
+            for cart_id in stale:
+                del self._carts[cart_id]
+            return len(stale)
+
+
+BACKENDS = {
+    'sql': SQLCartStore,
+    'memory': MemoryCartStore,
+}
+
+
+class Carts:
+    """Flask extension that picks the cart backend from CART_STORE and maps
+    the current session to its cart id."""
+
+    def __init__(self, app=None):
+        self.store = None
+        self.abandon_after = timedelta(days=30)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('CART_STORE', 'sql')
+        if backend not in BACKENDS:
+            raise ValueError(f'Unknown CART_STORE {backend!r}; choose from {sorted(BACKENDS)}')
+        self.store = BACKENDS[backend]()
+        self.abandon_after = app.config.get('CART_ABANDON_AFTER', self.abandon_after)
+        app.extensions['carts'] = self
+
+    def current_id(self, create=False):
+        cart_id = session.get('cart_id')
+        if cart_id is None and create:
+            cart_id = session['cart_id'] = secrets.token_hex(16)
+        return cart_id
+
+    def current(self):
+        return self.store.get(self.current_id()) if self.current_id() else _empty()
+
+    def current_lines(self):
+        return self.store.lines(self.current_id()) if self.current_id() else {}
+
+    def add(self, product, quantity=1):
+        self.store.add(self.current_id(create=True), product, quantity)
+
+    def set_quantity(self, product_id, quantity):
+        if self.current_id():
+            self.store.set_quantity(self.current_id(), product_id, quantity)
+
+    def remove(self, product_id, quantity=1):
+        if self.current_id():
+            self.store.remove(self.current_id(), product_id, quantity)
+
+    def clear(self):
+        cart_id = session.pop('cart_id', None)
+        if cart_id:
+            self.store.clear(cart_id)
+
+    def purge_abandoned(self):
+        return self.store.purge_abandoned(datetime.utcnow() - self.abandon_after)
+
+
+carts = Carts()
@@ -0,0 +1,151 @@
+# catalog.py
+# Cached read models for the public catalog pages.
+#
+# index() and view_farmer() render from the plain dicts built here rather
+# than from ORM objects, so a cache hit skips both the database and object
+# hydration. Any route that changes what the public catalog shows must call
+# invalidate_catalog() after committing.
+#
+# The catalog version lives in the catalog_version row, not just in this
+# process: invalidate_catalog() increments it, and catalog_state() reads it
+# once per request (a primary-key lookup) and moves the local cache to it.
+# So a write handled by one worker invalidates every worker's cache and
+# ETags on their next request.
+from datetime import datetime, timezone
+
+from flask import g, render_template, request, session
+from markupsafe import Markup
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload
+
+from extensions import db, catalog_cache, fragment_cache
+from models import CatalogVersion, Category, Product, User
+from pagination import Page, paginate_request, page_args
+from search import search_products, catalog_sort_keys
+
+
+def invalidate_catalog():
+    now = datetime.utcnow()
+    bumped = db.session.execute(
+        update(CatalogVersion).where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1, bumped_at=now)).rowcount
+    if not bumped:
+        db.session.add(CatalogVersion(id=1, version=1, bumped_at=now))
+    db.session.commit()
+    g.pop('catalog_state', None)
+    catalog_cache.bump()
+
+
+def catalog_state():
+    """(version, bumped_at) of the catalog as recorded in the database.
+
+    Read once per request; brings this process's catalog cache up to date.
+    """
+    state = g.get('catalog_state')
+    if state is None:
+        row = db.session.query(CatalogVersion.version, CatalogVersion.bumped_at) \
+            .filter(CatalogVersion.id == 1).first()
+        version, bumped_at = row if row else (0, datetime(1970, 1, 1))
+        state = g.catalog_state = (version, bumped_at.replace(tzinfo=timezone.utc))
+        catalog_cache.sync(version, state[1].timestamp())
+    return state
+
+
+def cached(key, build):
+    catalog_state()
+    return catalog_cache.get_or_build(key, build)
+
+
+def product_card(product):
+    category = product.category
+    farmer = product.farmer
+    return {
+        'id': product.id,
+        'name': product.name,
+        'description': product.description or '',
+        'price': product.price,
+        'quantity': product.quantity,
+        'image': product.image,
+        'updated_at': _timestamp(product.updated_at),
+        'category': {'id': category.id, 'name': category.name} if category else None,
+        'farmer': {'id': farmer.id, 'name': farmer.name, 'farm_name': farmer.farm_name,
+                   'updated_at': _timestamp(farmer.updated_at)},
+    }
+
+
+def farmer_profile(farmer):
+    return {
+        'id': farmer.id,
+        'name': farmer.name,
+        'farm_name': farmer.farm_name,
+        'location': farmer.location,
+        'bio': farmer.bio,
+        'phone': farmer.phone,
+        'profile_picture': farmer.profile_picture,
+        'is_approved': farmer.is_approved,
+        'role': {'name': farmer.role_name},
+    }
+
+
+def _timestamp(value):
+    return value.isoformat() if value else None
+
+
+def render_card(product, template='_product_card.html'):
+    """Render one product card, reusing the cached HTML when nothing changed.
+
+    The key covers everything the card shows: the product and farmer
+    versions, the category, and which footer the visitor gets.
+    """
+    audience = session.get('role') if 'user_id' in session else 'anonymous'
+    category = product['category']
+    key = (template, product['id'], product['updated_at'], product['farmer']['updated_at'],
+           category['name'] if category else None, audience)
+    html = fragment_cache.get_or_build(
+        key, lambda: render_template(template, product=product))
+    return Markup(html)
+
+
+def _page_key(prefix=''):
+    _, _, limit = page_args(prefix)
+    return (request.args.get(prefix + 'after'), request.args.get(prefix + 'before'), limit)
+
+
+def _card_page(query, keys, prefix=''):
+    page = paginate_request(query, keys, prefix)
+    return Page([product_card(p) for p in page.items], page.next_cursor,
+                page.prev_cursor, page.limit, page.prefix)
+
+
+def get_categories():
+    def build():
+        return [{'id': c.id, 'name': c.name} for c in Category.query.order_by(Category.id)]
+    return cached(('categories',), build)
+
+
+def get_catalog_page(search=None, category_id=None):
+    """One page of approved product cards for the catalog index."""
+    def build():
+        query = search_products(search, category_id).options(
+            joinedload(Product.category), joinedload(Product.farmer))
+        return _card_page(query, catalog_sort_keys(search))
+    key = ('catalog', search or '', category_id) + _page_key()
+    return cached(key, build)
+
+
+def get_farmer_profile(farmer_id):
+    """The farmer's public profile dict, or None if there is no such user."""
+    def build():
+        farmer = db.session.get(User, farmer_id)
+        # Cache misses for unknown ids too, so they don't hit the DB each time
+        return farmer_profile(farmer) if farmer else {}
+    return cached(('farmer', farmer_id), build) or None
+
+
+def get_farmer_products(farmer_id):
+    def build():
+        query = Product.query.options(joinedload(Product.category), joinedload(Product.farmer)) \
+            .filter_by(farmer_id=farmer_id, approved=True)
+        return _card_page(query, [(Product.id, True)])
+    key = ('farmer_products', farmer_id) + _page_key()
+    return cached(key, build)
@@ -0,0 +1,369 @@
+# commands.py
+# `flask` CLI commands, added to the app by init_commands().
+#
+# Modules only a command needs (the load-test harness, Flask-Migrate and
+# alembic) are imported inside that command, so starting the app to serve
+# requests never pays for loading them. `flask db` is a stand-in group that
+# sets up Flask-Migrate the first time one of its subcommands is looked up.
+#
+# `flask init-db` prepares a database: it creates whatever tables, search
+# index, default roles and categories and upload folders are missing, and
+# on a database already under migrations it upgrades to the latest
+# revision instead. Running it again changes nothing.
+import os
+import tempfile
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+
+from assets import build_assets, vendor_assets
+from bulk_import import FORMATS as IMPORT_FORMATS, guess_format, import_products
+from cart_store import carts
+from catalog import invalidate_catalog
+from extensions import catalog_cache, db, fragment_cache
+from images import backfill_variants
+from instrumentation import QueryBudgetExceeded, QueryPlanScan
+from models import Category, User, role_map, seed_defaults
+from order_export import FORMATS as EXPORT_FORMATS, export_orders, parse_date
+from search import init_search_index
+from sqlite_profile import PROFILES, benchmark
+from storage import REFERENCES, collect_garbage
+
+
+def init_migrate(app):
+    """Set up Flask-Migrate for `app` unless that has been done already."""
+    if 'migrate' not in app.extensions:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+
+class MigrateGroup(click.Group):
+    """`flask db`: hands the command line to Flask-Migrate's own group,
+    which is only imported once a `flask db ...` command actually runs."""
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        init_migrate(current_app._get_current_object())
+        from flask_migrate.cli import db as commands
+        return commands.make_context(info_name, args, parent=parent, **extra)
+
+
+db_command = MigrateGroup('db', help='Perform database migrations.')
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create or upgrade the schema and add the default roles and categories."""
+    for kind in REFERENCES:
+        os.makedirs(os.path.join(current_app.config['UPLOAD_FOLDER'], kind), exist_ok=True)
+
+    tables = set(inspect(db.engine).get_table_names())
+    if 'alembic_version' in tables:
+        init_migrate(current_app._get_current_object())
+        from flask_migrate import upgrade
+        upgrade()
+        print("Database upgraded to the latest migration.")
+    else:
+        db.create_all()
+        if not tables:
+            # A brand-new database already matches the latest migration
+            init_migrate(current_app._get_current_object())
+            from flask_migrate import stamp
+            stamp()
+        print(f"Tables created in {current_app.config['SQLALCHEMY_DATABASE_URI']}.")
+    init_search_index()
+
+    roles, categories = seed_defaults()
+    role_map.load()
+    invalidate_catalog()
+    print(f"Added {roles} roles and {categories} categories.")
+
+
+@click.command('purge-carts')
+@with_appcontext
+def purge_carts_command():
+    """Delete carts that have not been touched for CART_ABANDON_AFTER."""
+    count = carts.purge_abandoned()
+    print(f"Purged {count} abandoned carts.")
+
+
+@click.command('backfill-image-variants')
+@click.option('--overwrite', is_flag=True, help='Regenerate variants that already exist.')
+@with_appcontext
+def backfill_image_variants_command(overwrite):
+    """Create thumb/card/full WebP and JPEG variants for existing uploads."""
+    count = backfill_variants(overwrite=overwrite)
+    print(f"Wrote {count} image variants.")
+
+
+@click.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='List what would be deleted without deleting it.')
+@with_appcontext
+def gc_uploads_command(dry_run):
+    """Delete uploaded files no product or user refers to any more."""
+    removed = collect_garbage(dry_run=dry_run)
+    for path in removed:
+        print(path)
+    print(f"{'Would remove' if dry_run else 'Removed'} {len(removed)} files.")
+
+
+@click.command('build-assets')
+@click.option('--vendor', is_flag=True, help='Also download the icon fonts into static/vendor/.')
+@click.option('--force', is_flag=True, help='Download vendored files again even if present.')
+@with_appcontext
+def build_assets_command(vendor, force):
+    """Build the hashed CSS/JS bundles (and vendor the icon fonts)."""
+    if vendor:
+        for path in vendor_assets(force=force):
+            print(path)
+    for name, built in build_assets().items():
+        print(f"{name} -> {built}")
+
+
+@click.command('seed-bench')
+@click.option('--farmers', default=50, help='Farmer accounts to add.')
+@click.option('--pending', default=0.2, help='Fraction of farmers left awaiting approval.')
+@click.option('--products-per-farmer', default=20)
+@click.option('--customers', default=500)
+@click.option('--orders', default=5000, help='Historical orders, spread over the past year.')
+@click.option('--password', default='bench', help='Password of every seeded account.')
+@click.option('--seed', default=0, help='Random seed, for repeatable data.')
+@with_appcontext
+def seed_bench_command(farmers, pending, products_per_farmer, customers, orders, password, seed):
+    """Fill the database with synthetic data for `flask bench`."""
+    from loadtest import seed_bench
+    try:
+        counts = seed_bench(farmers, pending, products_per_farmer, customers, orders,
+                            password=password, seed=seed)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    invalidate_catalog()
+    print(', '.join(f"{count} {name}" for name, count in counts.items()))
+
+
+@click.command('bench')
+@click.option('--scenarios', help='Comma-separated scenarios to run (default: all).')
+@click.option('--concurrency', default=4, help='Concurrent clients.')
+@click.option('--requests', 'total', default=300, help='Requests per scenario.')
+@click.option('--url', default=None, help='Benchmark a running server instead of the test client.')
+@click.option('--password', default='bench', help='Password the bench accounts were seeded with.')
+@click.option('--baseline', type=click.Path(dir_okay=False), help='JSON baseline to compare with.')
+@click.option('--save-baseline', 'write_baseline', is_flag=True, help='Write the results to --baseline instead.')
+@click.option('--tolerance', default=0.5, help='Allowed p95 growth over the baseline (fraction).')
+@with_appcontext
+def bench_command(scenarios, concurrency, total, url, password, baseline, write_baseline, tolerance):
+    """Load-test the main pages and report latency percentiles."""
+    from loadtest import (SCENARIOS, AppClient, HTTPClient, compare, load_baseline,
+                          run_benchmark, save_baseline)
+    app = current_app._get_current_object()
+    if url:
+        make_client = lambda: HTTPClient(url)
+    else:
+        app.config['SQL_QUERY_COUNT_HEADER'] = True
+        make_client = lambda: AppClient(app)
+    names = scenarios.split(',') if scenarios else list(SCENARIOS)
+    try:
+        results = run_benchmark(make_client, names, concurrency, total, password)
+    except (ValueError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+
+    print(f"{'scenario':<18}{'requests':>9}{'errors':>8}{'req/s':>8}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+    for name, r in results.items():
+        queries = '-' if r['queries'] is None else f"{r['queries']:g}"
+        print(f"{name:<18}{r['requests']:>9}{r['errors']:>8}{r['rps']:>8}"
+              f"{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}{queries:>9}")
+
+    settings = {'concurrency': concurrency, 'target': url or 'test-client'}
+    if baseline and write_baseline:
+        save_baseline(baseline, results, **settings)
+        print(f"Baseline written to {baseline}.")
+    elif baseline:
+        stored_settings, stored = load_baseline(baseline)
+        if stored_settings != settings:
+            raise click.ClickException(f"The baseline was measured with {stored_settings}, not {settings}.")
+        regressions = compare(results, stored, tolerance)
+        for line in regressions:
+            print(f"REGRESSION  {line}")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against the baseline.")
+
+
+@click.command('bench-sqlite')
+@click.option('--threads', default='1,4,16', help='Comma-separated thread counts.')
+@click.option('--seconds', default=3.0, help='Duration of each run.')
+@click.option('--before', default='default', type=click.Choice(sorted(PROFILES)))
+@click.option('--after', default='production', type=click.Choice(sorted(PROFILES)))
+@with_appcontext
+def bench_sqlite_command(threads, seconds, before, after):
+    """Compare SQLite read/write throughput of two PRAGMA profiles."""
+    print(f"{'profile':<12}{'threads':>8}{'reads/s':>12}{'writes/s':>12}{'errors':>8}")
+    for count in [int(n) for n in threads.split(',')]:
+        for name in (before, after):
+            result = benchmark(PROFILES[name], count, seconds)
+            print(f"{name:<12}{count:>8}{result['reads']:>12.0f}{result['writes']:>12.0f}{result['errors']:>8}")
+
+
+@click.command('stress-checkout')
+@click.option('--buyers', default=16, help='Customers checking out at the same moment.')
+@click.option('--stock', default=5, help='Units in stock at the start of each round.')
+@click.option('--rounds', default=3)
+@with_appcontext
+def stress_checkout_command(buyers, stock, rounds):
+    """Race concurrent checkouts for scarce stock on a scratch database."""
+    from app import create_app
+    from loadtest import stress_checkout
+    with tempfile.TemporaryDirectory() as folder:
+        settings = {key: value for key, value in current_app.config.items() if key.isupper()}
+        settings['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(folder, 'stress.db')
+        scratch = create_app(type('StressConfig', (), settings))
+        with scratch.app_context():
+            db.create_all()
+        results = stress_checkout(scratch, buyers, stock, rounds)
+
+    failures = 0
+    for n, result in enumerate(results, 1):
+        print(f"round {n}: {result['placed']} orders, {result['refused']} sent back to the cart, "
+              f"{result['remaining']} left in stock")
+        for problem in result['problems']:
+            failures += 1
+            print(f"FAIL  {problem}")
+    if failures:
+        raise click.ClickException(f"{failures} problem(s) under concurrent checkout.")
+    print("No stock was oversold.")
+
+
+# Pages exercised by `flask check-query-plans`, as (role, path)
+PLAN_CHECK_PAGES = [
+    (None, '/'),
+    (None, '/?category={category}'),
+    (None, '/?search=milk'),
+    (None, '/farmer/{farmer}'),
+    ('customer', '/cart'),
+    ('customer', '/order_history'),
+    ('customer', '/customer_dashboard'),
+    ('farmer', '/farmer_dashboard'),
+    ('admin', '/admin_dashboard'),
+    (None, '/api/v1/products?fields=id,name,category,farm_name'),
+    (None, '/api/v1/products?farmer={farmer}&search=milk'),
+    (None, '/api/v1/categories'),
+]
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans_command():
+    """Request the main pages and fail if a query scans a whole table."""
+    app = current_app._get_current_object()
+    app.config.update(TESTING=True, SQL_EXPLAIN_PLANS=True, SQL_QUERY_BUDGET_STRICT=True)
+    role_map.load()
+    users = {}
+    for role in ('customer', 'farmer', 'admin'):
+        query = User.query.filter_by(role_id=role_map.id(role))
+        if role == 'farmer':
+            # A pending farmer's page redirects, so its queries would never run
+            query = query.filter_by(is_approved=True)
+        user = query.first()
+        users[role] = user.id if user else None
+    category = Category.query.first()
+    ids = {'category': category.id if category else 0, 'farmer': users['farmer'] or 0}
+    db.session.remove()
+
+    failures = 0
+    for role, path in PLAN_CHECK_PAGES:
+        path = path.format(**ids)
+        if role and users[role] is None:
+            print(f"SKIP  {path} ({'no approved' if role == 'farmer' else 'no'} {role} account)")
+            continue
+        # Start cold, in a context of its own, so no session, g or cached page
+        # carries over from the lookups above or the previous request
+        catalog_cache.clear()
+        fragment_cache.clear()
+        with app.app_context():
+            client = app.test_client()
+            if role:
+                with client.session_transaction() as sess:
+                    sess['user_id'] = users[role]
+                    sess['role'] = role
+            try:
+                response = client.get(path)
+            except (QueryPlanScan, QueryBudgetExceeded) as e:
+                failures += 1
+                print(f"FAIL  {path}: {e}")
+                continue
+        if response.status_code != 200:
+            failures += 1
+            print(f"FAIL  {path}: status {response.status_code}, its queries were not checked")
+        else:
+            print(f"ok    {path} ({response.headers.get('X-Query-Count')} queries)")
+    if failures:
+        raise click.ClickException(f"{failures} page(s) failed the query plan check.")
+
+
+@click.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--farmer', required=True, help='Email or id of the farmer who owns the products.')
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), help='Defaults to the file extension.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per INSERT batch and transaction.')
+@with_appcontext
+def import_products_command(path, farmer, fmt, chunk_size):
+    """Create or update a farmer's products from a CSV or JSONL file, keyed on SKU."""
+    if farmer.isdigit():
+        user = db.session.get(User, int(farmer))
+    else:
+        user = User.query.filter_by(email=farmer).first()
+    if user is None or user.role_name != 'farmer':
+        raise click.ClickException(f"No farmer account {farmer!r}.")
+    fmt = fmt or guess_format(path)
+    if fmt is None:
+        raise click.ClickException("Can't tell the format from the file name; pass --format.")
+    with open(path, 'rb') as stream:
+        result = import_products(stream, user.id, fmt, chunk_size)
+    invalidate_catalog()
+    for line, message in result.errors:
+        print(f"line {line}: {message}")
+    print(f"Imported {result.imported} rows, {result.failed} failed.")
+
+
+@click.command('export-orders')
+@click.argument('output', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--start', help='First order date to include (YYYY-MM-DD).')
+@click.option('--end', help='Last order date to include (YYYY-MM-DD).')
+@click.option('--farmer', type=int, help='Only lines for this farmer\'s products.')
+@click.option('--gzip', 'gzip', is_flag=True, help='Compress the output (implied by a .gz file name).')
+@with_appcontext
+def export_orders_command(output, fmt, start, end, farmer, gzip):
+    """Stream order lines to a CSV or JSONL file ('-' for stdout)."""
+    try:
+        start, end = parse_date(start), parse_date(end)
+    except ValueError:
+        raise click.BadParameter('dates must be in YYYY-MM-DD format')
+    chunks = export_orders(fmt, start, end, farmer, gzip=gzip or output.endswith('.gz'))
+    with click.open_file(output, 'wb') as out:
+        for chunk in chunks:
+            out.write(chunk)
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index_command():
+    """Recreate the product full-text index from the products table."""
+    init_search_index(rebuild=True)
+    print("Search index rebuilt.")
+
+
+COMMANDS = [
+    db_command, init_db_command, purge_carts_command, backfill_image_variants_command,
+    gc_uploads_command, build_assets_command, seed_bench_command, bench_command,
+    bench_sqlite_command, stress_checkout_command, check_query_plans_command, import_products_command,
+    export_orders_command, rebuild_search_index_command,
+]
+
+
+def init_commands(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
@@ -9,6 +9,76 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'app.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool for threaded servers; each worker thread holds at most one connection
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 16,
+        'max_overflow': 4,
+        'pool_timeout': 10,
+        'pool_pre_ping': True,
+    }
+    # PRAGMAs for SQLite connections (see sqlite_profile.py): 'production' or 'default'
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE') or 'production'
+    SQLITE_PRAGMAS = {}  # Per-deployment overrides, e.g. {'busy_timeout': 10000}
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
\ No newline at end of file
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    # Per-kind upload limits, checked while the file streams in (see storage.py)
+    UPLOAD_LIMITS = {
+        'licenses': 8 * 1024 * 1024,
+        'products': 5 * 1024 * 1024,
+        'profiles': 5 * 1024 * 1024,
+        'imports': 16 * 1024 * 1024,   # CSV/JSONL product imports
+    }
+    UPLOAD_SPOOL_SIZE = 64 * 1024  # Bytes of each uploaded file kept in memory before spilling to disk
+    PAGE_SIZE = 24      # Default rows per page on paginated lists
+    MAX_PAGE_SIZE = 100 # Upper bound for the ?limit= query parameter
+    # SQL statements a request may issue before it is flagged (see instrumentation.py)
+    SQL_QUERY_BUDGET = 20
+    SQL_QUERY_BUDGETS = {
+        'shop.index': 4,
+        'shop.view_farmer': 4,
+        'shop.order_history': 4,
+        'admin.admin_dashboard': 10,
+        'api.products': 2,
+        'api.farmer': 2,
+        'api.categories': 2,
+    }
+    SQL_QUERY_BUDGET_STRICT = os.environ.get('SQL_QUERY_BUDGET_STRICT') == '1'  # Raise instead of logging
+    SQL_QUERY_COUNT_HEADER = os.environ.get('SQL_QUERY_COUNT_HEADER') == '1'  # X-Query-Count outside debug, for `flask bench`
+    # EXPLAIN every SELECT a request runs and flag full table scans (SQLite, development only)
+    SQL_EXPLAIN_PLANS = os.environ.get('SQL_EXPLAIN_PLANS') == '1'
+    SQL_SCAN_ALLOWED = {
+        None: {'roles', 'categories'},                 # Small lookup tables, any endpoint
+        'admin.admin_dashboard': {'users', 'orders'},  # Full user list paged by id; total order count
+    }
+    # In-process cache of catalog pages and farmer profiles (see cache.py)
+    CATALOG_CACHE_MAX_ENTRIES = 512               # 0 disables the cache
+    CATALOG_CACHE_MAX_BYTES = 32 * 1024 * 1024    # Pickled size of all entries
+    CATALOG_CACHE_TTL = 60                        # Seconds
+    # Rendered product-card HTML, keyed by product id and updated_at
+    FRAGMENT_CACHE_MAX_ENTRIES = 4096
+    FRAGMENT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+    FRAGMENT_CACHE_TTL = 3600
+    # Server-side carts (see cart_store.py): 'sql' or 'memory'
+    CART_STORE = os.environ.get('CART_STORE') or 'sql'
+    CART_ABANDON_AFTER = timedelta(days=30)  # 'flask purge-carts' removes older carts
+    # Password hashing (see passwords.py). Changing the cost upgrades hashes at next login.
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_WORKERS = 2   # Threads running bcrypt per process
+    PASSWORD_HASH_QUEUE = 16    # Jobs allowed to wait; beyond this logins are refused
+    PASSWORD_HASH_TIMEOUT = 10  # Seconds to wait for a result
+    # Serving uploads (see uploads.py): None, 'x-sendfile' or 'x-accel'
+    UPLOADS_SENDFILE = os.environ.get('UPLOADS_SENDFILE') or None
+    UPLOADS_ACCEL_PREFIX = '/protected-uploads/'  # nginx internal location aliased to UPLOAD_FOLDER
+    UPLOADS_MAX_AGE = 365 * 24 * 3600             # For URLs carrying the file's current ?v= digest
+    UPLOAD_GC_GRACE = timedelta(hours=1)  # 'flask gc-uploads' spares unreferenced files newer than this
+    # Static bundles (see assets.py)
+    ASSETS_AUTO_BUILD = os.environ.get('ASSETS_AUTO_BUILD') != '0'  # Rebuild stale bundles at startup
+    ASSETS_MAX_AGE = 365 * 24 * 3600  # Cache lifetime of hashed bundles and vendored files
+    COMPRESS_HTML = True      # Gzip HTML responses for clients that accept it
+    COMPRESS_MIN_SIZE = 1024  # Bytes; smaller bodies are sent as they are
+    COMPRESS_LEVEL = 6
+    # /metrics (see metrics.py); when METRICS_TOKEN is set scrapers must send it as a Bearer token
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    # Log requests slower than this many seconds with their SQL statements; None turns it off
+    SLOW_REQUEST_THRESHOLD = float(os.environ['SLOW_REQUEST_THRESHOLD']) if os.environ.get('SLOW_REQUEST_THRESHOLD') else None
\ No newline at end of file
@@ -2,7 +2,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_bcrypt import Bcrypt
+from cache import ReadModelCache
 
 db = SQLAlchemy()
 login_manager = LoginManager()
-bcrypt = Bcrypt()
\ No newline at end of file
+bcrypt = Bcrypt()
+catalog_cache = ReadModelCache()
+fragment_cache = ReadModelCache(config_prefix='FRAGMENT_CACHE')
\ No newline at end of file
@@ -0,0 +1,140 @@
+# farmers.py
+# The farmer's dashboard: adding, editing, importing and deleting products.
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+from sqlalchemy.orm import joinedload
+
+from bulk_import import guess_format, import_products
+from catalog import invalidate_catalog
+from extensions import db
+from identity import get_current_user
+from images import store_image
+from models import Category, Product
+from storage import UploadRejected, accepts_uploads, allowed_file
+
+farmers = Blueprint('farmers', __name__)
+
+@farmers.route('/farmer_dashboard')
+def farmer_dashboard():
+    if 'user_id' not in session or session['role'] != 'farmer':
+        return redirect(url_for('auth.login'))
+    user = get_current_user()
+    products = Product.query.options(joinedload(Product.category)) \
+        .filter_by(farmer_id=user.id).all()
+    return render_template('farmer_dashboard.html', user=user, products=products)
+
+@farmers.route('/farmer/import_products', methods=['POST'])
+@accepts_uploads('imports')
+def import_products_upload():
+    if 'user_id' not in session or session['role'] != 'farmer':
+        return redirect(url_for('auth.login'))
+    
+    file = request.files.get('file')
+    fmt = guess_format(file.filename) if file and file.filename else None
+    if fmt is None:
+        flash('Please choose a .csv or .jsonl file to import.', 'error')
+        return redirect(url_for('farmers.farmer_dashboard'))
+    
+    result = import_products(file.stream, session['user_id'], fmt)
+    invalidate_catalog()
+    flash(f'Imported {result.imported} products; new and changed ones await admin approval.', 'success')
+    if result.failed:
+        flash(f'{result.failed} rows were skipped.', 'error')
+        # Only the first few; flashes live in the session cookie
+        for line, message in result.errors[:10]:
+            flash(f'Line {line}: {message}', 'error')
+    return redirect(url_for('farmers.farmer_dashboard'))
+
+@farmers.route('/add_product', methods=['GET', 'POST'])
+@accepts_uploads('products')
+def add_product():
+    if 'user_id' not in session or session['role'] != 'farmer':
+        return redirect(url_for('auth.login'))
+    
+    if request.method == 'POST':
+        name = request.form['name']
+        description = request.form['description']
+        price = float(request.form['price'])
+        quantity = int(request.form['quantity'])
+        category_id = request.form.get('category_id')
+        
+        product = Product(
+            name=name, 
+            description=description, 
+            price=price, 
+            quantity=quantity, 
+            farmer_id=session['user_id'],
+            category_id=category_id if category_id else None
+        )
+        
+        # Handle product image upload
+        if 'image' in request.files:
+            file = request.files['image']
+            if file and file.filename != '' and allowed_file(file.filename):
+                try:
+                    filename = store_image('products', file)
+                except UploadRejected as e:
+                    flash(str(e), 'error')
+                    return redirect(url_for('farmers.add_product'))
+                product.image = filename
+        
+        db.session.add(product)
+        db.session.commit()
+        flash('Product added, awaiting admin approval', 'success')
+        return redirect(url_for('farmers.farmer_dashboard'))
+    
+    categories = Category.query.all()
+    return render_template('product_form.html', action='Add', categories=categories)
+
+@farmers.route('/update_product/<int:id>', methods=['GET', 'POST'])
+@accepts_uploads('products')
+def update_product(id):
+    if 'user_id' not in session or session['role'] != 'farmer':
+        return redirect(url_for('auth.login'))
+    
+    product = Product.query.get_or_404(id)
+    if product.farmer_id != session['user_id']:
+        flash('Unauthorized', 'error')
+        return redirect(url_for('farmers.farmer_dashboard'))
+    
+    if request.method == 'POST':
+        product.name = request.form['name']
+        product.description = request.form['description']
+        product.price = float(request.form['price'])
+        product.quantity = int(request.form['quantity'])
+        product.category_id = request.form.get('category_id')
+        product.approved = False  # Reset approval status when updated
+        
+        # Handle product image upload
+        if 'image' in request.files:
+            file = request.files['image']
+            if file and file.filename != '' and allowed_file(file.filename):
+                try:
+                    filename = store_image('products', file)
+                except UploadRejected as e:
+                    flash(str(e), 'error')
+                    return redirect(url_for('farmers.update_product', id=id))
+                product.image = filename
+        
+        db.session.commit()
+        invalidate_catalog()
+        flash('Product updated, awaiting admin approval', 'success')
+        return redirect(url_for('farmers.farmer_dashboard'))
+    
+    categories = Category.query.all()
+    return render_template('product_form.html', product=product, action='Update', categories=categories)
+
+@farmers.route('/delete_product/<int:id>')
+def delete_product(id):
+    if 'user_id' not in session or session['role'] != 'farmer':
+        return redirect(url_for('auth.login'))
+    
+    product = Product.query.get_or_404(id)
+    if product.farmer_id != session['user_id']:
+        flash('Unauthorized', 'error')
+        return redirect(url_for('farmers.farmer_dashboard'))
+    
+    db.session.delete(product)
+    db.session.commit()
+    invalidate_catalog()
+    flash('Product deleted', 'success')
+    return redirect(url_for('farmers.farmer_dashboard'))
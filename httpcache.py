@@ -0,0 +1,110 @@
+# httpcache.py
+# Conditional GET support (ETag / Last-Modified / 304) for catalog pages.
+#
+# The validator is derived from the catalog version kept in the database
+# (see catalog.py), so it can be checked before the view runs: a matching
+# If-None-Match is answered with a bare 304 after one primary-key lookup and
+# no template work. Every worker reads the same version, so they all agree
+# on the ETag of a page and a write through any of them changes it.
+#
+# A digest of the templates is mixed in as well, so a deploy that changes
+# the markup doesn't leave clients on their cached copy; it is the same in
+# every worker running the same code.
+import hashlib
+from functools import lru_cache, wraps
+
+from flask import current_app, make_response, request, session
+
+from catalog import catalog_state
+
+
+@lru_cache(maxsize=1)
+def _release():
+    env = current_app.jinja_env
+    digest = hashlib.sha256()
+    for name in env.list_templates():
+        digest.update(name.encode('utf-8'))
+        digest.update(env.loader.get_source(env, name)[0].encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def _etag(variant):
+    version, _ = catalog_state()
+    raw = f'{_release()}:{version}:{request.full_path}:{variant}'
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def _page_etag():
+    # The page varies by URL and by the navigation shown for the visitor's role
+    audience = session.get('role') if 'user_id' in session else 'anonymous'
+    return _etag(audience)
+
+
+def _last_modified():
+    _, bumped_at = catalog_state()
+    return bumped_at.replace(microsecond=0)
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        # Weak comparison, as If-None-Match requires: gzipped pages carry W/ tags
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return request.if_modified_since >= last_modified
+    return False
+
+
+def _add_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    if 'user_id' in session:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+    return response
+
+
+def conditional_page(view):
+    """Serve a 304 for catalog pages the client already has."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Pages with pending flash messages must render to show them
+        if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+            return view(*args, **kwargs)
+
+        etag = _page_etag()
+        last_modified = _last_modified()
+        if _not_modified(etag, last_modified):
+            return _add_validators(make_response('', 304), etag, last_modified)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            _add_validators(response, etag, last_modified)
+        return response
+    return wrapper
+
+
+def conditional_resource(variant):
+    """conditional_page for responses that don't depend on the session.
+
+    `variant()` names the representation the request will get (e.g. its
+    content encoding) so each one has its own ETag. Responses are publicly
+    cacheable whoever asked.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = _etag(variant())
+            last_modified = _last_modified()
+            if _not_modified(etag, last_modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'public, max-age=0, must-revalidate'
+            return response
+        return wrapper
+    return decorator
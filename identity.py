@@ -0,0 +1,25 @@
+# identity.py
+# The logged-in user, loaded at most once per request.
+#
+# Routes, templates and Flask-Login's user_loader all go through
+# get_current_user(), which memoizes the User on flask.g, so an
+# authenticated page costs a single identity query however many places ask.
+from flask import g, session
+
+from extensions import db, login_manager
+from models import User
+
+
+def get_current_user():
+    if '_current_user' not in g:
+        user_id = session.get('user_id')
+        g._current_user = db.session.get(User, user_id) if user_id is not None else None
+    return g._current_user
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    user = get_current_user()
+    if user is not None and user.id == int(user_id):
+        return user
+    return db.session.get(User, int(user_id))
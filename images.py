@@ -0,0 +1,161 @@
+# images.py
+# Resized, recompressed variants of uploaded product and profile images.
+#
+# For an upload saved as uploads/products/foo.png we write
+#   uploads/products/variants/foo.thumb.webp  foo.thumb.jpg
+#   uploads/products/variants/foo.card.webp   foo.card.jpg
+#   uploads/products/variants/foo.full.webp   foo.full.jpg
+# and templates pick between them with <picture>/srcset, falling back to the
+# original file when no variants exist (yet). Licence documents are private
+# and only ever viewed full size by admins, so they are left alone.
+#
+# Images whose header claims more than MAX_PIXELS are refused before Pillow
+# decodes them: a few KB of PNG can describe gigabytes of pixels.
+import os
+
+from flask import current_app
+from markupsafe import Markup, escape
+
+from metrics import UPLOADS_REJECTED
+from storage import UploadRejected, discard_upload, store_upload
+from uploads import upload_url
+
+IMAGE_KINDS = ('products', 'profiles')
+MAX_PIXELS = 40_000_000  # Width x height, e.g. 8000 x 5000
+
+# Variant name -> width in pixels (used as the srcset w descriptor)
+VARIANTS = {
+    'thumb': 120,
+    'card': 480,
+    'full': 1200,
+}
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+class ImageTooLarge(UploadRejected):
+    """The image has too many pixels to be decoded safely."""
+
+
+def variant_name(filename, variant, fmt):
+    stem = os.path.splitext(filename)[0]
+    return f'{stem}.{variant}.{fmt}'
+
+
+def variants_dir(kind):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], kind, 'variants')
+
+
+def variant_path(kind, filename, variant, fmt):
+    return os.path.join(variants_dir(kind), variant_name(filename, variant, fmt))
+
+
+def make_variants(kind, filename, overwrite=True):
+    """Write every variant of uploads/<kind>/<filename>.
+
+    Returns the number of files written. Raises ImageTooLarge for images
+    over MAX_PIXELS or that Pillow takes for a decompression bomb; other
+    files Pillow cannot read are logged and skipped.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    source = os.path.join(current_app.config['UPLOAD_FOLDER'], kind, filename)
+    os.makedirs(variants_dir(kind), exist_ok=True)
+    written = 0
+    try:
+        with Image.open(source) as original:
+            # Only the header has been read so far
+            width, height = original.size
+            if width * height > MAX_PIXELS:
+                raise ImageTooLarge(f'Images can be at most {MAX_PIXELS / 1_000_000:g} megapixels '
+                                    f'(this one is {width} x {height}).')
+            image = ImageOps.exif_transpose(original)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+            for variant, width in VARIANTS.items():
+                resized = image.copy()
+                resized.thumbnail((width, width * 4), Image.LANCZOS)
+                for fmt, (pil_format, options) in FORMATS.items():
+                    target = variant_path(kind, filename, variant, fmt)
+                    if not overwrite and os.path.exists(target):
+                        continue
+                    out = resized
+                    if pil_format == 'JPEG' and out.mode == 'RGBA':
+                        # JPEG has no alpha channel; flatten onto white
+                        out = Image.new('RGB', resized.size, (255, 255, 255))
+                        out.paste(resized, mask=resized.getchannel('A'))
+                    out.save(target, pil_format, **options)
+                    written += 1
+    except Image.DecompressionBombError as exc:
+        raise ImageTooLarge(f'Images can be at most {MAX_PIXELS / 1_000_000:g} megapixels.') from exc
+    except (OSError, UnidentifiedImageError) as exc:
+        current_app.logger.warning('Could not make variants of %s/%s: %s', kind, filename, exc)
+    return written
+
+
+def store_image(kind, file):
+    """store_upload() plus make_variants(); returns the filename.
+
+    Raises UploadRejected, and discards the stored file, if the image is
+    too large to decode.
+    """
+    filename = store_upload(kind, file)
+    try:
+        make_variants(kind, filename, overwrite=False)
+    except ImageTooLarge:
+        UPLOADS_REJECTED.inc(kind=kind)
+        discard_upload(kind, filename)
+        raise
+    return filename
+
+
+def has_variants(kind, filename):
+    return bool(filename) and os.path.exists(variant_path(kind, filename, 'thumb', 'jpg'))
+
+
+def variant_url(kind, filename, variant, fmt):
+    return upload_url(kind, variant_name(filename, variant, fmt), variants=True)
+
+
+def image_srcset(kind, filename, fmt):
+    return ', '.join(f'{variant_url(kind, filename, variant, fmt)} {width}w'
+                     for variant, width in VARIANTS.items())
+
+
+def picture(kind, filename, alt='', sizes='100vw', default='card', **attrs):
+    """<picture> tag with WebP and JPEG srcsets, or a plain <img> of the
+    original upload if it has no variants."""
+    extra = ''.join(f' {name.rstrip("_").replace("_", "-")}="{escape(value)}"'
+                    for name, value in attrs.items())
+    if not has_variants(kind, filename):
+        return Markup(f'<img src="{escape(upload_url(kind, filename))}" '
+                      f'alt="{escape(alt)}"{extra} loading="lazy">')
+    return Markup(
+        '<picture>'
+        f'<source type="image/webp" srcset="{escape(image_srcset(kind, filename, "webp"))}" '
+        f'sizes="{escape(sizes)}">'
+        f'<img src="{escape(variant_url(kind, filename, default, "jpg"))}" '
+        f'srcset="{escape(image_srcset(kind, filename, "jpg"))}" sizes="{escape(sizes)}" '
+        f'alt="{escape(alt)}"{extra} loading="lazy">'
+        '</picture>'
+    )
+
+
+def backfill_variants(overwrite=False):
+    """Create missing variants for every existing product/profile upload."""
+    created = 0
+    for kind in IMAGE_KINDS:
+        folder = os.path.join(current_app.config['UPLOAD_FOLDER'], kind)
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            # Skip in-progress uploads (see storage.py)
+            if not filename.startswith('.') and os.path.isfile(os.path.join(folder, filename)):
+                try:
+                    created += make_variants(kind, filename, overwrite=overwrite)
+                except ImageTooLarge as exc:
+                    current_app.logger.warning('Skipped %s/%s: %s', kind, filename, exc)
+    return created
@@ -0,0 +1,145 @@
+# instrumentation.py
+# Per-request SQL query counting and timing.
+#
+# A before_cursor_execute listener bumps a counter on flask.g for every
+# statement sent to the database. After each request the count is compared
+# with the configured budget (SQL_QUERY_BUDGETS per endpoint, falling back to
+# SQL_QUERY_BUDGET). Going over budget logs a warning, or raises
+# QueryBudgetExceeded when SQL_QUERY_BUDGET_STRICT is on - which is how tests
+# catch a route that has grown an N+1 query. The time spent in statements is
+# summed on g.sql_query_time as well, and when g.sql_statement_log is a list
+# (the slow-request log, see metrics.py) each statement is appended to it
+# with its duration.
+#
+# With SQL_EXPLAIN_PLANS on, every SELECT a request ran is also put through
+# EXPLAIN QUERY PLAN (SQLite only) after the response is built, and a full
+# table scan is reported the same way (QueryPlanScan in strict mode). Tables
+# in SQL_SCAN_ALLOWED may be scanned, globally or by the listed endpoints.
+# `flask check-query-plans` drives the main pages through this check.
+import re
+import time
+from contextlib import contextmanager
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# "SCAN products" / "SCAN TABLE products" (older SQLite), but not index scans
+# ("SCAN products USING COVERING INDEX ..."), virtual tables (FTS5) or
+# "SCAN CONSTANT ROW"
+_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(?!CONSTANT ROW)(\w+)(?!.*\b(?:INDEX|VIRTUAL TABLE)\b)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, endpoint, count, budget):
+        super().__init__(f'{endpoint} issued {count} SQL queries (budget {budget})')
+        self.endpoint = endpoint
+        self.count = count
+        self.budget = budget
+
+
+class QueryPlanScan(AssertionError):
+    def __init__(self, endpoint, table, statement):
+        super().__init__(f'{endpoint} scans table {table}: {" ".join(statement.split())}')
+        self.endpoint = endpoint
+        self.table = table
+        self.statement = statement
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context() and not statement.startswith('EXPLAIN'):
+        g.sql_query_count = g.get('sql_query_count', 0) + 1
+        statements = g.get('_sql_statements')
+        if statements is not None and not executemany and statement.lstrip().upper().startswith('SELECT'):
+            statements.append((conn.engine, statement, parameters))
+        conn.info['query_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _time_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is None or not has_app_context():
+        return
+    elapsed = time.perf_counter() - started
+    g.sql_query_time = g.get('sql_query_time', 0.0) + elapsed
+    log = g.get('sql_statement_log')
+    if log is not None:
+        log.append((elapsed, statement))
+
+
+def query_count():
+    """Number of SQL statements issued so far in the current app context."""
+    return g.get('sql_query_count', 0)
+
+
+def full_scans(engine, statement, parameters=()):
+    """Tables the SQLite query plan for `statement` reads in full."""
+    if engine.dialect.name != 'sqlite':
+        return []
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+    # Rows are (id, parent, notused, detail)
+    return [m.group(1) for m in (_FULL_SCAN.match(row[-1]) for row in plan) if m]
+
+
+def scan_allowed(app, endpoint, table):
+    allowed = app.config.get('SQL_SCAN_ALLOWED') or {}
+    return table in allowed.get(None, ()) or table in allowed.get(endpoint, ())
+
+
+def query_budget_for(app, endpoint):
+    budgets = app.config.get('SQL_QUERY_BUDGETS') or {}
+    return budgets.get(endpoint, app.config.get('SQL_QUERY_BUDGET'))
+
+
+@contextmanager
+def query_budget(budget, label='block'):
+    """Fail if the wrapped block issues more than `budget` SQL statements.
+
+        with query_budget(4, 'index'):
+            client.get('/')
+    """
+    counter = [0]
+
+    def count(*args):
+        counter[0] += 1
+
+    event.listen(Engine, 'before_cursor_execute', count)
+    try:
+        yield counter
+    finally:
+        event.remove(Engine, 'before_cursor_execute', count)
+    if counter[0] > budget:
+        raise QueryBudgetExceeded(label, counter[0], budget)
+
+
+def init_query_counter(app):
+    @app.before_request
+    def reset_query_count():
+        g.sql_query_count = 0
+        g.sql_query_time = 0.0
+        if app.config.get('SQL_EXPLAIN_PLANS'):
+            g._sql_statements = []
+
+    @app.after_request
+    def check_query_budget(response):
+        count = query_count()
+        if app.debug or app.testing or app.config.get('SQL_QUERY_COUNT_HEADER'):
+            response.headers['X-Query-Count'] = str(count)
+
+        for engine, statement, parameters in g.pop('_sql_statements', None) or ():
+            for table in full_scans(engine, statement, parameters):
+                if scan_allowed(app, request.endpoint, table):
+                    continue
+                if app.config.get('SQL_QUERY_BUDGET_STRICT'):
+                    raise QueryPlanScan(request.endpoint, table, statement)
+                app.logger.warning('%s scans table %s: %s', request.endpoint, table, statement)
+
+        budget = query_budget_for(app, request.endpoint)
+        if budget is not None and count > budget:
+            if app.config.get('SQL_QUERY_BUDGET_STRICT'):
+                raise QueryBudgetExceeded(request.endpoint, count, budget)
+            app.logger.warning('%s issued %d SQL queries (budget %d)',
+                               request.endpoint, count, budget)
+        return response
@@ -0,0 +1,487 @@
+# loadtest.py
+# Synthetic data and a load benchmark for the main pages.
+#
+# seed_bench() fills the database with farmers (some still pending),
+# products across the categories, customers and a year of order history,
+# written with executemany INSERTs and explicit ids so a few hundred
+# thousand rows take seconds. Every seeded account is
+# bench-<role>-<n>@example.com with the same password.
+#
+# run_benchmark() drives SCENARIOS with a pool of threads, each one holding
+# its own logged-in client per role: either the Werkzeug test client
+# (in process) or plain HTTP against a running server. It reports latency
+# percentiles and SQL statements per request (from X-Query-Count; a server
+# must run with SQL_QUERY_COUNT_HEADER=1 for that), and compare() checks the
+# figures against a stored baseline.
+#
+# The checkout scenario places real orders: point DATABASE_URL at a
+# scratch database, never at production.
+#
+# stress_checkout() races many customers through checkout for a product
+# with too little stock and checks that no unit is ever sold twice.
+import http.cookiejar
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, update
+
+from extensions import db
+from models import Category, Order, OrderItem, Product, User, role_map, seed_defaults
+from passwords import password_hasher
+
+BENCH_EMAIL = 'bench-{role}-{n}@example.com'
+BATCH_SIZE = 5000
+
+_FIRST_NAMES = ['Anil', 'Priya', 'Ravi', 'Lakshmi', 'Suresh', 'Meera', 'Arjun', 'Divya',
+                'Gopal', 'Kavya', 'Manoj', 'Nisha', 'Rahul', 'Sneha', 'Vijay', 'Asha']
+_LAST_NAMES = ['Nair', 'Menon', 'Pillai', 'Kumar', 'Iyer', 'Reddy', 'Varma', 'Das']
+_PLACES = ['Thrissur', 'Palakkad', 'Wayanad', 'Idukki', 'Kottayam', 'Kollam', 'Kannur', 'Ernakulam']
+_FARM_WORDS = ['Green', 'Valley', 'Hill', 'River', 'Sunrise', 'Meadow', 'Coconut', 'Lotus']
+_ADJECTIVES = ['Fresh', 'Organic', 'Farm', 'Pure', 'Desi', 'A2', 'Homemade', 'Full Cream']
+_SIZES = ['200 g', '500 g', '1 kg', '500 ml', '1 litre', '2 litre']
+
+
+def _insert(model, rows):
+    for i in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(model), rows[i:i + BATCH_SIZE])
+
+
+def _next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def _name(rng):
+    return f'{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}'
+
+
+def seed_bench(farmers=50, pending=0.2, products_per_farmer=20, customers=500, orders=5000,
+               max_items=5, days=365, password='bench', seed=0):
+    """Add synthetic users, products and order history; returns row counts.
+
+    Raises ValueError if bench accounts already exist.
+    """
+    if User.query.filter(User.email.like('bench-%@example.com')).first():
+        raise ValueError('This database already has bench data.')
+    seed_defaults()
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    # One hash for every account; bcrypt per row would take minutes
+    password_hash = password_hasher.hash(password)
+    categories = {c.id: c.name for c in Category.query}
+    category_ids = sorted(categories)
+
+    user_id = _next_id(User)
+    users = [{'id': user_id, 'name': 'Bench Admin', 'email': BENCH_EMAIL.format(role='admin', n=0),
+              'password': password_hash, 'role_id': role_map.id('admin'), 'is_approved': True,
+              'updated_at': now}]
+    farmer_ids = []
+    for n in range(farmers):
+        user_id += 1
+        approved = rng.random() >= pending
+        place = rng.choice(_PLACES)
+        users.append({
+            'id': user_id, 'name': _name(rng), 'email': BENCH_EMAIL.format(role='farmer', n=n),
+            'password': password_hash, 'role_id': role_map.id('farmer'), 'is_approved': approved,
+            'farm_name': f'{rng.choice(_FARM_WORDS)} {rng.choice(_FARM_WORDS)} Dairy',
+            'location': place, 'bio': f'Family dairy farm near {place}.',
+            'phone': f'9{rng.randrange(10 ** 8, 10 ** 9)}', 'updated_at': now,
+        })
+        farmer_ids.append((user_id, approved))
+    customer_ids = []
+    for n in range(customers):
+        user_id += 1
+        users.append({
+            'id': user_id, 'name': _name(rng), 'email': BENCH_EMAIL.format(role='customer', n=n),
+            'password': password_hash, 'role_id': role_map.id('customer'), 'is_approved': True,
+            'address': f'{rng.randrange(1, 200)} Main Road, {rng.choice(_PLACES)}',
+            'updated_at': now,
+        })
+        customer_ids.append(user_id)
+    _insert(User, users)
+
+    product_id = _next_id(Product)
+    products = []
+    for farmer_id, farmer_approved in farmer_ids:
+        for n in range(products_per_farmer):
+            category_id = rng.choice(category_ids)
+            name = f'{rng.choice(_ADJECTIVES)} {categories[category_id]}'
+            products.append({
+                'id': product_id, 'farmer_id': farmer_id, 'category_id': category_id,
+                'name': f'{name} {rng.choice(_SIZES)}', 'sku': f'BENCH-{n:05d}',
+                'description': f'{name} from our own herd, collected and packed the same day.',
+                'price': round(rng.uniform(30, 900), 2),
+                'quantity': 10 ** 6,  # Checkout scenarios must never run out
+                'approved': farmer_approved and rng.random() < 0.9,
+                'updated_at': now,
+            })
+            product_id += 1
+    _insert(Product, products)
+
+    on_sale = [(p['id'], p['price']) for p in products if p['approved']]
+    order_rows, item_rows = [], []
+    order_id = _next_id(Order)
+    if on_sale and customer_ids:
+        for _ in range(orders):
+            lines = rng.sample(on_sale, min(len(on_sale), rng.randint(1, max_items)))
+            quantities = [rng.randint(1, 4) for _ in lines]
+            order_rows.append({
+                'id': order_id, 'customer_id': rng.choice(customer_ids),
+                'date': now - timedelta(seconds=rng.randrange(days * 86400)),
+                'shipping_address': 'Bench order',
+                'total': round(sum(price * q for (_, price), q in zip(lines, quantities)), 2),
+                'item_count': sum(quantities),
+            })
+            item_rows.extend({'order_id': order_id, 'product_id': pid, 'quantity': q,
+                              'price_at_purchase': price}
+                             for (pid, price), q in zip(lines, quantities))
+            order_id += 1
+    _insert(Order, order_rows)
+    _insert(OrderItem, item_rows)
+    db.session.commit()
+    return {'users': len(users), 'products': len(products), 'orders': len(order_rows),
+            'order_items': len(item_rows)}
+
+
+# --- Clients -------------------------------------------------------------------
+
+class AppClient:
+    """Werkzeug test client returning (status, query count, Location) per request."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None):
+        response = self.client.open(path, method=method, data=data)
+        response.close()
+        return response.status_code, _query_count(response.headers), response.headers.get('Location', '')
+
+    def get_json(self, path):
+        return self.client.get(path).get_json()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPClient:
+    """The same interface over HTTP, with its own cookie jar."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode('utf-8') if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                response.read()
+                return response.status, _query_count(response.headers), response.headers.get('Location', '')
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, _query_count(e.headers), e.headers.get('Location', '')
+
+    def get_json(self, path):
+        with self.opener.open(self.base_url + path, timeout=30) as response:
+            return json.load(response)
+
+
+def _query_count(headers):
+    value = headers.get('X-Query-Count')
+    return int(value) if value is not None else None
+
+
+# --- Scenarios -----------------------------------------------------------------
+
+def _add_item(client, ctx):
+    client.request('GET', f'/add_to_cart/{ctx.rng.choice(ctx.product_ids)}')
+    client.request('GET', '/cart')  # Shows (and so clears) the flash messages
+
+
+def _page_shown(status, location):
+    # A redirect means a lost session (to /login) or a refused request
+    return status == 200
+
+
+def _order_placed(status, location):
+    # A refused checkout redirects too, back to /cart
+    return status == 302 and location.endswith('/order_history')
+
+
+# name -> (role to log in as, unmeasured preparation or None, measured request,
+#          success check on (status, Location))
+SCENARIOS = {
+    'index': (None, None, lambda client, ctx: client.request('GET', '/'), _page_shown),
+    'view_farmer': (None, None, lambda client, ctx: client.request(
+        'GET', f'/farmer/{ctx.rng.choice(ctx.farmer_ids)}'), _page_shown),
+    'cart': ('customer', None, lambda client, ctx: client.request('GET', '/cart'), _page_shown),
+    'checkout': ('customer', _add_item, lambda client, ctx: client.request(
+        'POST', '/checkout', {'shipping_address': 'Bench order'}), _order_placed),
+    'order_history': ('customer', None, lambda client, ctx: client.request('GET', '/order_history'),
+                      _page_shown),
+    'admin_dashboard': ('admin', None, lambda client, ctx: client.request('GET', '/admin_dashboard'),
+                        _page_shown),
+}
+
+WARMUP = 5  # Unmeasured requests per worker before each scenario
+
+
+class _Worker:
+    def __init__(self, n, make_client, password, product_ids, farmer_ids, seed):
+        self.n = n
+        self.make_client = make_client
+        self.password = password
+        self.product_ids = product_ids
+        self.farmer_ids = farmer_ids
+        self.rng = random.Random(seed + n)
+        self.clients = {}
+
+    def client(self, role):
+        if role not in self.clients:
+            client = self.make_client()
+            if role is not None:
+                _login(client, BENCH_EMAIL.format(role=role, n=0 if role == 'admin' else self.n),
+                       self.password)
+                if role == 'customer':
+                    _add_item(client, self)
+            self.clients[role] = client
+        return self.clients[role]
+
+
+def _login(client, email, password):
+    # Logins are bcrypt-bound and the hasher pool sheds load with 503s
+    for _ in range(20):
+        status, _, _ = client.request('POST', '/login', {'email': email, 'password': password})
+        if status == 302:
+            return
+        if status != 503:
+            raise RuntimeError(f'Could not log in as {email} (status {status}); run `flask seed-bench` first')
+        time.sleep(0.5)
+    raise RuntimeError(f'Could not log in as {email}: password pool stayed busy')
+
+
+def _catalog_ids(client, pages=10):
+    """Approved product ids and the farmers selling them, from the JSON API."""
+    product_ids, farmer_ids = [], set()
+    cursor = None
+    for _ in range(pages):
+        path = '/api/v1/products?fields=id,farmer_id&limit=100'
+        body = client.get_json(path + (f'&after={cursor}' if cursor else ''))
+        for row in body['data']:
+            product_ids.append(row['id'])
+            farmer_ids.add(row['farmer_id'])
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+    return product_ids, sorted(farmer_ids)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))  # ceil
+    return sorted_values[int(rank) - 1]
+
+
+def _round(ms):
+    return round(ms, 2) if ms is not None else None
+
+
+def _summarize(samples, elapsed):
+    latencies = sorted(ms for ms, _, _ in samples)
+    counts = [q for _, _, q in samples if q is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, ok, _ in samples if not ok),
+        'rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'p50': _round(percentile(latencies, 50)),
+        'p95': _round(percentile(latencies, 95)),
+        'p99': _round(percentile(latencies, 99)),
+        'queries': round(sum(counts) / len(counts), 2) if counts else None,
+    }
+
+
+def run_benchmark(make_client, scenarios=None, concurrency=4, requests=300,
+                  password='bench', seed=0, warmup=WARMUP):
+    """Run each scenario with `concurrency` threads issuing `requests` in total.
+
+    `make_client()` returns a new AppClient or HTTPClient. Each worker first
+    issues `warmup` unmeasured requests, to fill caches and pools. Returns
+    {scenario: {requests, errors, rps, p50, p95, p99 (ms), queries}}.
+    """
+    names = list(scenarios or SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        raise ValueError(f"Unknown scenario(s) {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+    product_ids, farmer_ids = _catalog_ids(make_client())
+    if not product_ids:
+        raise RuntimeError('No approved products to benchmark with; run `flask seed-bench` first')
+    workers = [_Worker(n, make_client, password, product_ids, farmer_ids, seed)
+               for n in range(concurrency)]
+
+    results = {}
+    with ThreadPoolExecutor(concurrency) as pool:
+        for name in names:
+            role, prepare, measure, succeeded = SCENARIOS[name]
+            # Log in outside the timed part
+            list(pool.map(lambda worker: worker.client(role), workers))
+            samples = []
+            lock = threading.Lock()
+
+            def work(worker, count):
+                client = worker.client(role)
+                for _ in range(warmup):
+                    if prepare is not None:
+                        prepare(client, worker)
+                    measure(client, worker)
+                mine = []
+                for _ in range(count):
+                    if prepare is not None:
+                        prepare(client, worker)
+                    started = time.perf_counter()
+                    status, queries, location = measure(client, worker)
+                    mine.append(((time.perf_counter() - started) * 1000, succeeded(status, location), queries))
+                with lock:
+                    samples.extend(mine)
+
+            shares = [requests // concurrency + (1 if n < requests % concurrency else 0)
+                      for n in range(concurrency)]
+            started = time.perf_counter()
+            list(pool.map(work, workers, shares))
+            results[name] = _summarize(samples, time.perf_counter() - started)
+    return results
+
+
+def load_baseline(path):
+    """(settings, results) stored by save_baseline()."""
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    return baseline['settings'], baseline['scenarios']
+
+
+def save_baseline(path, results, **settings):
+    """Store results with the settings they were measured under; figures
+    taken at another concurrency aren't comparable."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'settings': settings, 'scenarios': results}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, tolerance=0.5, min_delta_ms=2.0, query_slack=0.5):
+    """Regressions against a baseline, as human-readable strings.
+
+    p95 may grow by `tolerance` (a fraction) and by at least `min_delta_ms`
+    before it counts, to ride out timing noise. Queries per request are an
+    average (cache hits skip the database), so they may drift by
+    `query_slack`; a route gaining a whole statement per request fails, as
+    does any new error.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['errors'] > base.get('errors', 0):
+            regressions.append(f"{name}: {result['errors']} errors (baseline {base.get('errors', 0)})")
+        if base.get('p95') is not None and result['p95'] is not None:
+            allowed = max(base['p95'] * (1 + tolerance), base['p95'] + min_delta_ms)
+            if result['p95'] > allowed:
+                regressions.append(f"{name}: p95 {result['p95']:.1f} ms (baseline {base['p95']:.1f} ms)")
+        if base.get('queries') is not None and result['queries'] is not None \
+                and result['queries'] > base['queries'] + query_slack:
+            regressions.append(f"{name}: {result['queries']} queries/request (baseline {base['queries']})")
+    return regressions
+
+
+# --- Checkout stress -----------------------------------------------------------
+
+def _stress_accounts(buyers):
+    seed_defaults()
+    farmer = User(name='Stress Farmer', email='stress-farmer@example.com', password='',
+                  role_id=role_map.id('farmer'), is_approved=True)
+    customers = [User(name=f'Stress Buyer {n}', email=f'stress-customer-{n}@example.com',
+                      password='', role_id=role_map.id('customer'), is_approved=True)
+                 for n in range(buyers)]
+    db.session.add_all([farmer] + customers)
+    db.session.flush()
+    product = Product(name='Stress Milk', price=1.0, quantity=0, approved=True, farmer_id=farmer.id)
+    db.session.add(product)
+    db.session.commit()
+    return product.id, [c.id for c in customers]
+
+
+def _units_sold(product_id):
+    return db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0)) \
+        .filter(OrderItem.product_id == product_id).scalar()
+
+
+def stress_checkout(app, buyers=16, stock=5, rounds=3):
+    """Have `buyers` customers check out one unit each of a product with
+    `stock` units, all at the same moment, `rounds` times over.
+
+    Run it on a scratch database: it adds its own accounts and orders.
+    Returns one dict per round; `problems` lists every broken invariant
+    (stock below zero, units sold not matching the stock taken, more or
+    fewer orders than there were units, or an unexpected response).
+    """
+    with app.app_context():
+        product_id, customer_ids = _stress_accounts(buyers)
+
+    results = []
+    for _ in range(rounds):
+        with app.app_context():
+            db.session.execute(update(Product).where(Product.id == product_id).values(quantity=stock))
+            db.session.commit()
+            sold_before = _units_sold(product_id)
+
+        clients = []
+        for customer_id in customer_ids:
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['user_id'] = customer_id
+                sess['role'] = 'customer'
+            client.get(f'/add_to_cart/{product_id}')
+            clients.append(client)
+
+        barrier = threading.Barrier(buyers)
+
+        def checkout(client):
+            barrier.wait()
+            response = client.post('/checkout', data={'shipping_address': 'Stress test'})
+            return response.status_code, response.headers.get('Location', '')
+
+        with ThreadPoolExecutor(buyers) as pool:
+            outcomes = list(pool.map(checkout, clients))
+
+        with app.app_context():
+            remaining = db.session.get(Product, product_id).quantity
+            sold = _units_sold(product_id) - sold_before
+
+        placed = sum(1 for status, location in outcomes if _order_placed(status, location))
+        refused = sum(1 for status, location in outcomes
+                      if status == 302 and location.endswith('/cart'))
+        problems = []
+        if remaining < 0:
+            problems.append(f'stock went negative ({remaining})')
+        if sold != stock - remaining:
+            problems.append(f'{sold} units ordered but {stock - remaining} taken from stock')
+        if placed != sold:
+            problems.append(f'{placed} checkouts succeeded for {sold} units ordered')
+        if placed != min(buyers, stock):
+            problems.append(f'{placed} orders placed, expected {min(buyers, stock)}')
+        if placed + refused != buyers:
+            statuses = sorted({status for status, _ in outcomes})
+            problems.append(f'{buyers - placed - refused} unexpected responses (statuses {statuses})')
+        results.append({'placed': placed, 'refused': refused, 'remaining': remaining,
+                        'problems': problems})
+    return results
@@ -0,0 +1,241 @@
+# metrics.py
+# Process metrics in the Prometheus text format, served on /metrics.
+#
+# Request hooks record, per endpoint: a latency histogram, counts by method
+# and status, response bytes, and the number and total time of the SQL
+# statements the request ran (timed by instrumentation.py). bcrypt time and
+# upload bytes are recorded where they happen (passwords.py, storage.py);
+# cache and password-pool figures are read from those objects when scraped.
+#
+# Recording is a perf_counter() call and a locked dict update, cheap enough
+# to leave on. Metrics are per process: with several workers, scrape each
+# one (or put them behind a per-worker port) just as for the caches.
+#
+# SLOW_REQUEST_THRESHOLD (seconds) turns on the slow-request log: requests
+# that take longer are logged with every SQL statement they ran.
+import bisect
+import threading
+import time
+
+from flask import Response, abort, current_app, g, request
+
+from extensions import catalog_cache, fragment_cache
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SLOW_LOG_STATEMENTS = 50  # Statements listed per slow request, at most
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{v}"' for n, v in extra]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(n, '') for n in self.label_names)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for name, key, value in self.samples():
+            lines.append(f'{name}{_labels(self.label_names, key)} {_number(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # Per-bucket counts (made cumulative when rendered), sum, count
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            values = sorted((key, (list(counts), total, count))
+                            for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                cumulative += n
+                labels = _labels(self.label_names, key, [('le', _number(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_number(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class Collected(_Metric):
+    """A metric whose samples are read from elsewhere at scrape time;
+    `collect()` returns a list of (label values tuple, value)."""
+
+    def __init__(self, name, help, type, labels, collect):
+        super().__init__(name, help, labels)
+        self.type = type
+        self.collect = collect
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in self.collect()]
+
+
+registry = []
+
+REQUESTS = Counter('http_requests_total', 'HTTP requests by endpoint, method and status.',
+                   ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = Histogram('http_request_duration_seconds',
+                            'Time to build the response, by endpoint.', ('endpoint',))
+IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests being handled right now.')
+RESPONSE_BYTES = Counter('http_response_bytes_total',
+                         'Response body bytes sent, by endpoint (streamed bodies excluded).',
+                         ('endpoint',))
+SQL_QUERIES = Counter('sql_queries_total', 'SQL statements executed, by endpoint.', ('endpoint',))
+SQL_SECONDS = Counter('sql_query_seconds_total', 'Time spent in SQL statements, by endpoint.',
+                      ('endpoint',))
+BCRYPT_SECONDS = Histogram('bcrypt_duration_seconds', 'Time of one bcrypt hash or check.',
+                           ('operation',))
+UPLOAD_BYTES = Counter('upload_bytes_total', 'Bytes of uploads stored, by kind.', ('kind',))
+UPLOADS_REJECTED = Counter('uploads_rejected_total', 'Uploads that failed validation, by kind.',
+                           ('kind',))
+
+
+def _cache_stat(stat):
+    def collect():
+        return [((name,), cache.stats()[stat])
+                for name, cache in (('catalog', catalog_cache), ('fragment', fragment_cache))]
+    return collect
+
+
+for _stat, _type in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                     ('entries', 'gauge'), ('bytes', 'gauge')):
+    Collected(f'cache_{_stat}' + ('_total' if _type == 'counter' else ''),
+              f'Read-model cache {_stat}.', _type, ('cache',), _cache_stat(_stat))
+
+
+def _hasher_stat(stat):
+    def collect():
+        return [((), current_app.extensions['password_hasher'].stats()[stat])]
+    return collect
+
+
+Collected('bcrypt_in_flight', 'Password hashing jobs running or queued.', 'gauge', (),
+          _hasher_stat('in_flight'))
+Collected('bcrypt_rejected_total', 'Password hashing jobs turned away as busy.', 'counter', (),
+          _hasher_stat('rejected'))
+
+
+def render_metrics():
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+
+def init_metrics(app):
+    threshold = app.config.get('SLOW_REQUEST_THRESHOLD')
+
+    @app.before_request
+    def start_request_timer():
+        g._request_started = time.perf_counter()
+        IN_FLIGHT.inc()
+        if threshold is not None:
+            g.sql_statement_log = []
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('_request_started')
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = _endpoint()
+        REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+        REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+        if not response.is_streamed and response.content_length is not None:
+            RESPONSE_BYTES.inc(response.content_length, endpoint=endpoint)
+        queries = g.get('sql_query_count', 0)
+        if queries:
+            SQL_QUERIES.inc(queries, endpoint=endpoint)
+            SQL_SECONDS.inc(g.get('sql_query_time', 0.0), endpoint=endpoint)
+
+        if threshold is not None and elapsed >= threshold:
+            statements = g.get('sql_statement_log') or []
+            listed = '\n'.join(f'  {seconds * 1000:8.1f} ms  {" ".join(statement.split())}'
+                               for seconds, statement in statements[:SLOW_LOG_STATEMENTS])
+            app.logger.warning('Slow request: %s %s (%s) took %.0f ms, %d SQL statements in %.0f ms\n%s',
+                               request.method, request.full_path, endpoint, elapsed * 1000,
+                               queries, g.get('sql_query_time', 0.0) * 1000, listed)
+        return response
+
+    @app.teardown_request
+    def finish_request(exc=None):
+        if g.pop('_request_started', None) is not None:
+            IN_FLIGHT.dec()
+
+    @app.route('/metrics')
+    def metrics():
+        token = current_app.config.get('METRICS_TOKEN')
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            abort(403)
+        return Response(render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,75 @@
+"""Add FTS5 product search index
+
+Revision ID: 6b1f0c3e9a27
+Revises: 2fcd5204b872
+Create Date: 2026-10-17 09:12:41.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b1f0c3e9a27'
+down_revision = '2fcd5204b872'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name, description, farm_name,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, name, description, farm_name)
+            VALUES (new.id, new.name, coalesce(new.description, ''),
+                    (SELECT coalesce(farm_name, '') FROM users WHERE id = new.farmer_id));
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS products_fts_au
+        AFTER UPDATE OF name, description, farmer_id ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.id;
+            INSERT INTO products_fts(rowid, name, description, farm_name)
+            VALUES (new.id, new.name, coalesce(new.description, ''),
+                    (SELECT coalesce(farm_name, '') FROM users WHERE id = new.farmer_id));
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF farm_name ON users BEGIN
+            UPDATE products_fts SET farm_name = coalesce(new.farm_name, '')
+            WHERE rowid IN (SELECT id FROM products WHERE farmer_id = new.id);
+        END
+    """)
+
+    # Index the products that already exist
+    op.execute("DELETE FROM products_fts")
+    op.execute("""
+        INSERT INTO products_fts(rowid, name, description, farm_name)
+        SELECT p.id, p.name, coalesce(p.description, ''), coalesce(u.farm_name, '')
+        FROM products p LEFT JOIN users u ON u.id = p.farmer_id
+    """)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS users_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS products_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS products_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS products_fts_ai")
+    op.execute("DROP TABLE IF EXISTS products_fts")
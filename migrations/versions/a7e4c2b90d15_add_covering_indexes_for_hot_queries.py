@@ -0,0 +1,34 @@
+"""Add composite indexes for catalog, farmer, order and cart queries
+
+Revision ID: a7e4c2b90d15
+Revises: f5c1d8e3a902
+Create Date: 2026-10-17 13:02:44.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7e4c2b90d15'
+down_revision = 'f5c1d8e3a902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_products_farmer_approved_id', 'products', ['farmer_id', 'approved', 'id'], unique=False)
+    op.create_index('ix_products_category_approved_id', 'products', ['category_id', 'approved', 'id'], unique=False)
+    op.create_index('ix_orders_customer_date_id', 'orders', ['customer_id', 'date', 'id'], unique=False)
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+    op.create_index(op.f('ix_order_items_product_id'), 'order_items', ['product_id'], unique=False)
+    op.create_index(op.f('ix_cart_items_product_id'), 'cart_items', ['product_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_cart_items_product_id'), table_name='cart_items')
+    op.drop_index(op.f('ix_order_items_product_id'), table_name='order_items')
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
+    op.drop_index('ix_orders_customer_date_id', table_name='orders')
+    op.drop_index('ix_products_category_approved_id', table_name='products')
+    op.drop_index('ix_products_farmer_approved_id', table_name='products')
@@ -0,0 +1,27 @@
+"""Add per-farmer product SKU for bulk imports
+
+Revision ID: b3f8d1e67c42
+Revises: a7e4c2b90d15
+Create Date: 2026-10-17 13:40:12.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f8d1e67c42'
+down_revision = 'a7e4c2b90d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('sku', sa.String(length=64), nullable=True))
+    op.create_index('uq_products_farmer_sku', 'products', ['farmer_id', 'sku'], unique=True)
+
+
+def downgrade():
+    op.drop_index('uq_products_farmer_sku', table_name='products')
+    # Plain DROP COLUMN (SQLite 3.35+) keeps the search index triggers intact
+    op.drop_column('products', 'sku')
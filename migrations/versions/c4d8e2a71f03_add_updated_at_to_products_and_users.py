@@ -0,0 +1,34 @@
+"""Add updated_at to products and users
+
+Revision ID: c4d8e2a71f03
+Revises: 6b1f0c3e9a27
+Create Date: 2026-10-17 10:03:55.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8e2a71f03'
+down_revision = '6b1f0c3e9a27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    op.execute("UPDATE products SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+    op.execute("UPDATE users SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+
+
+def downgrade():
+    # Plain ALTER TABLE ... DROP COLUMN (SQLite 3.35+) rather than batch mode,
+    # which would rebuild the tables and lose the products_fts triggers.
+    op.drop_column('users', 'updated_at')
+    op.drop_column('products', 'updated_at')
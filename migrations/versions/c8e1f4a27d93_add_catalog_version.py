@@ -0,0 +1,32 @@
+"""Add the shared catalog version row
+
+Revision ID: c8e1f4a27d93
+Revises: b3f8d1e67c42
+Create Date: 2026-10-17 18:20:44.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e1f4a27d93'
+down_revision = 'b3f8d1e67c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    catalog_version = op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('bumped_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(catalog_version, [{'id': 1, 'version': 0, 'bumped_at': datetime.utcnow()}])
+
+
+def downgrade():
+    op.drop_table('catalog_version')
@@ -0,0 +1,26 @@
+"""Add indexes for the admin moderation queues
+
+Revision ID: d9a3b6f42e18
+Revises: c4d8e2a71f03
+Create Date: 2026-10-17 10:48:20.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a3b6f42e18'
+down_revision = 'c4d8e2a71f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_role_approved', 'users', ['role_id', 'is_approved'], unique=False)
+    op.create_index('ix_products_approved_id', 'products', ['approved', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_products_approved_id', table_name='products')
+    op.drop_index('ix_users_role_approved', table_name='users')
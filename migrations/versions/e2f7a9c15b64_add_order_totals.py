@@ -0,0 +1,35 @@
+"""Add denormalized total and item_count to orders
+
+Revision ID: e2f7a9c15b64
+Revises: d9a3b6f42e18
+Create Date: 2026-10-17 11:20:07.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f7a9c15b64'
+down_revision = 'd9a3b6f42e18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('orders', sa.Column('total', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('orders', sa.Column('item_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from the order lines
+    op.execute("""
+        UPDATE orders SET
+            total = coalesce((SELECT sum(quantity * price_at_purchase)
+                              FROM order_items WHERE order_items.order_id = orders.id), 0),
+            item_count = coalesce((SELECT sum(quantity)
+                                   FROM order_items WHERE order_items.order_id = orders.id), 0)
+    """)
+
+
+def downgrade():
+    op.drop_column('orders', 'item_count')
+    op.drop_column('orders', 'total')
@@ -0,0 +1,49 @@
+"""Add server-side carts
+
+Revision ID: f5c1d8e3a902
+Revises: e2f7a9c15b64
+Create Date: 2026-10-17 12:05:31.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5c1d8e3a902'
+down_revision = 'e2f7a9c15b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('carts',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('item_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('carts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_carts_updated_at'), ['updated_at'], unique=False)
+
+    op.create_table('cart_items',
+    sa.Column('cart_id', sa.String(length=32), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=False),
+    sa.Column('added_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['cart_id'], ['carts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('cart_id', 'product_id')
+    )
+
+
+def downgrade():
+    op.drop_table('cart_items')
+    with op.batch_alter_table('carts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_carts_updated_at'))
+
+    op.drop_table('carts')
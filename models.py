@@ -1,5 +1,6 @@
 # models.py
-from extensions import db, bcrypt
+from extensions import db
+from passwords import password_hasher
 from flask_login import UserMixin
 from datetime import datetime
 
@@ -13,6 +14,63 @@ class Role(db.Model):
     def __repr__(self):
         return f'<Role {self.name}>'
 
+class RoleMap:
+    """id <-> name map of the roles table.
+
+    The table holds a handful of rows that never change at runtime, so it is
+    read once per process and reloaded only when an unknown id or name is
+    looked up (e.g. right after the roles were seeded).
+    """
+    def __init__(self):
+        self._names = {}
+        self._ids = {}
+
+    def load(self):
+        rows = db.session.query(Role.id, Role.name).order_by(Role.id).all()
+        self._ids = {name: role_id for role_id, name in rows}
+        self._names = {role_id: name for role_id, name in rows}
+
+    def name(self, role_id):
+        if role_id not in self._names:
+            self.load()
+        return self._names.get(role_id)
+
+    def id(self, name):
+        if name not in self._ids:
+            self.load()
+        return self._ids.get(name)
+
+    def all(self):
+        if not self._names:
+            self.load()
+        return [{'id': role_id, 'name': name} for role_id, name in self._names.items()]
+
+role_map = RoleMap()
+
+DEFAULT_ROLES = ['admin', 'farmer', 'customer']
+DEFAULT_CATEGORIES = ['Milk', 'Curd', 'Ghee', 'Butter', 'Cheese', 'Paneer']
+
+def seed_defaults():
+    """Add the default roles and categories to empty tables.
+
+    Returns (roles added, categories added).
+    """
+    roles = categories = 0
+    if not Role.query.first():
+        for name in DEFAULT_ROLES:
+            db.session.add(Role(name=name))
+        roles = len(DEFAULT_ROLES)
+    if not Category.query.first():
+        for name in DEFAULT_CATEGORIES:
+            db.session.add(Category(name=name))
+        categories = len(DEFAULT_CATEGORIES)
+    if db.session.get(CatalogVersion, 1) is None:
+        db.session.add(CatalogVersion(id=1, version=0))
+    db.session.commit()
+    if roles:
+        role_map.load()
+    return roles, categories
+
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -30,14 +88,29 @@ class User(db.Model, UserMixin):
     license_filename = db.Column(db.String(255))        # Stores the license document filename
     # --- END OF NEW FIELDS ---
     role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     products = db.relationship('Product', backref='farmer', lazy=True)
     orders = db.relationship('Order', backref='customer', lazy=True)
+
+    __table_args__ = (
+        # Admin dashboard: pending farmers queue
+        db.Index('ix_users_role_approved', 'role_id', 'is_approved'),
+    )
     
+    # Both run on the bounded bcrypt pool and may raise passwords.HasherBusy
     def set_password(self, password):
-        self.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password = password_hasher.hash(password)
     
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password, password)
+        return password_hasher.verify(self.password, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password)
+
+    @property
+    def role_name(self):
+        # Resolved from the preloaded role map instead of the lazy relationship
+        return role_map.name(self.role_id)
     
     def __repr__(self):
         return f'<User {self.name}>'
@@ -59,10 +132,23 @@ class Product(db.Model):
     price = db.Column(db.Float, nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     image = db.Column(db.String(100))
+    sku = db.Column(db.String(64))  # Farmer's own stock code; the key for bulk imports
     approved = db.Column(db.Boolean, default=False)
     farmer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     order_items = db.relationship('OrderItem', backref='product', lazy=True)
+
+    __table_args__ = (
+        # Admin dashboard: pending / approved product queues
+        db.Index('ix_products_approved_id', 'approved', 'id'),
+        # Farmer profile and dashboard; also used by delete_user
+        db.Index('ix_products_farmer_approved_id', 'farmer_id', 'approved', 'id'),
+        # Catalog filtered by category
+        db.Index('ix_products_category_approved_id', 'category_id', 'approved', 'id'),
+        # Bulk import upserts on this; products without a SKU don't conflict
+        db.Index('uq_products_farmer_sku', 'farmer_id', 'sku', unique=True),
+    )
     
     def __repr__(self):
         return f'<Product {self.name}>'
@@ -73,7 +159,15 @@ class Order(db.Model):
     date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     shipping_address = db.Column(db.Text, nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    # Written once at checkout so order lists don't have to load the items
+    total = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    item_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     items = db.relationship('OrderItem', backref='order', lazy=True)
+
+    __table_args__ = (
+        # Order history, newest first, keyset-paged on (date, id)
+        db.Index('ix_orders_customer_date_id', 'customer_id', 'date', 'id'),
+    )
     
     def __repr__(self):
         return f'<Order {self.id}>'
@@ -83,8 +177,51 @@ class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     quantity = db.Column(db.Integer, nullable=False)
     price_at_purchase = db.Column(db.Float, nullable=False)
-    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('orders.id'), nullable=False, index=True)
+    # Indexed so foreign key checks on product deletes don't scan every order line
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
     
     def __repr__(self):
-        return f'<OrderItem {self.id}>'
\ No newline at end of file
+        return f'<OrderItem {self.id}>'
+
+class Cart(db.Model):
+    __tablename__ = 'carts'
+    id = db.Column(db.String(32), primary_key=True)  # Opaque token kept in the session cookie
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    # Running totals, adjusted on every change. Product deletes cascade past them,
+    # so the cart page sums its lines instead (see cart_store.py)
+    total = db.Column(db.Float, nullable=False, default=0)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    items = db.relationship('CartItem', backref='cart', lazy=True,
+                            cascade='all, delete-orphan', order_by='CartItem.added_at')
+
+    def __repr__(self):
+        return f'<Cart {self.id}>'
+
+class CartItem(db.Model):
+    __tablename__ = 'cart_items'
+    cart_id = db.Column(db.String(32), db.ForeignKey('carts.id', ondelete='CASCADE'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True,
+                           index=True)  # The primary key only covers lookups by cart
+    quantity = db.Column(db.Integer, nullable=False)
+    # Product name and price as they were when added to the cart
+    name = db.Column(db.String(100), nullable=False)
+    unit_price = db.Column(db.Float, nullable=False)
+    added_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CartItem {self.cart_id}:{self.product_id}>'
+
+class CatalogVersion(db.Model):
+    """Single row counting changes to the public catalog (see catalog.py).
+
+    Every worker reads it, so caches and ETags agree across processes.
+    """
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    bumped_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CatalogVersion {self.version}>'
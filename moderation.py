@@ -0,0 +1,105 @@
+# moderation.py
+# Bulk approve / reject for the admin moderation queues.
+#
+# Each action takes a list of ids and works through it in IN (...) batches
+# inside a single transaction: one SELECT to find which ids the action
+# applies to, then one UPDATE or DELETE for those. Ids that don't qualify
+# (already approved, not a farmer, or still referenced by orders) are
+# returned as skipped instead of failing the whole request. The caller
+# commits and invalidates the catalog once.
+from datetime import datetime
+
+from sqlalchemy import or_
+
+from extensions import db
+from models import OrderItem, Product, User, role_map
+
+BATCH_SIZE = 500
+MAX_IDS = 5000
+
+
+def parse_ids(values):
+    """Distinct positive ints from a list of strings or numbers; raises
+    TypeError or ValueError."""
+    if not isinstance(values, list):
+        # A string would otherwise be read one digit at a time
+        raise TypeError('ids must be a list')
+    ids = sorted({int(v) for v in values})
+    if not ids or ids[0] < 1:
+        raise ValueError('no ids given')
+    if len(ids) > MAX_IDS:
+        raise ValueError(f'at most {MAX_IDS} ids per request')
+    return ids
+
+
+def _batches(ids):
+    for i in range(0, len(ids), BATCH_SIZE):
+        yield ids[i:i + BATCH_SIZE]
+
+
+def _apply(ids, eligible, action):
+    """Run `action(batch)` on the eligible ids of each batch.
+
+    `eligible(batch)` returns a query of the ids in the batch the action may
+    touch. Returns (done, skipped) id lists.
+    """
+    done = []
+    for batch in _batches(ids):
+        matched = [row[0] for row in eligible(batch)]
+        if matched:
+            action(matched)
+            done.extend(matched)
+    matched = set(done)
+    return done, [i for i in ids if i not in matched]
+
+
+def approve_products(ids):
+    return _apply(
+        ids,
+        lambda batch: db.session.query(Product.id)
+            .filter(Product.id.in_(batch), Product.approved == False),
+        lambda batch: Product.query.filter(Product.id.in_(batch))
+            .update({'approved': True, 'updated_at': datetime.utcnow()}, synchronize_session=False),
+    )
+
+
+def reject_products(ids):
+    # Products on past orders stay; deleting them would orphan the order lines
+    return _apply(
+        ids,
+        lambda batch: db.session.query(Product.id)
+            .filter(Product.id.in_(batch), Product.approved == False,
+                    ~db.session.query(OrderItem.id).filter(OrderItem.product_id == Product.id).exists()),
+        lambda batch: Product.query.filter(Product.id.in_(batch)).delete(synchronize_session=False),
+    )
+
+
+def _pending_farmers(batch):
+    # NULL counts as pending, as on the dashboard (admin.admin_dashboard)
+    return db.session.query(User.id).filter(
+        User.id.in_(batch), User.role_id == role_map.id('farmer'),
+        or_(User.is_approved == False, User.is_approved.is_(None)))
+
+
+def approve_farmers(ids):
+    return _apply(
+        ids, _pending_farmers,
+        lambda batch: User.query.filter(User.id.in_(batch))
+            .update({'is_approved': True, 'updated_at': datetime.utcnow()}, synchronize_session=False),
+    )
+
+
+def reject_farmers(ids):
+    # Deletes the pending account; farmers that already have products are skipped
+    return _apply(
+        ids,
+        lambda batch: _pending_farmers(batch)
+            .filter(~db.session.query(Product.id).filter(Product.farmer_id == User.id).exists()),
+        lambda batch: User.query.filter(User.id.in_(batch)).delete(synchronize_session=False),
+    )
+
+
+ACTIONS = {
+    'products': {'approve': approve_products, 'reject': reject_products},
+    'farmers': {'approve': approve_farmers, 'reject': reject_farmers},
+}
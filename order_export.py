@@ -0,0 +1,115 @@
+# order_export.py
+# Streaming export of order lines for accounting.
+#
+# One row per order item, joined with its order, customer, product and
+# farmer. The query selects plain columns (no ORM objects, so nothing builds
+# up in the session) and is read in yield_per batches through a server-side
+# cursor; rows are formatted and, optionally, gzipped as they arrive. Memory
+# use therefore stays flat however many lines are exported.
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import aliased
+
+from extensions import db
+from models import Order, OrderItem, Product, User
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+BATCH_SIZE = 1000
+
+COLUMNS = [
+    'order_id', 'order_date', 'customer_id', 'customer_name', 'customer_email',
+    'product_id', 'sku', 'product_name', 'farmer_id', 'farmer_name',
+    'quantity', 'unit_price', 'line_total',
+]
+
+
+def parse_date(value):
+    """YYYY-MM-DD -> datetime, or None for an empty value; raises ValueError."""
+    return datetime.strptime(value, '%Y-%m-%d') if value else None
+
+
+def order_lines(start=None, end=None, farmer_id=None):
+    """Tuples in COLUMNS order, oldest order first.
+
+    `end` is inclusive: orders placed any time on that day are included.
+    """
+    customer = aliased(User)
+    farmer = aliased(User)
+    query = db.session.query(
+        Order.id, Order.date, customer.id, customer.name, customer.email,
+        OrderItem.product_id, Product.sku, Product.name, farmer.id, farmer.name,
+        OrderItem.quantity, OrderItem.price_at_purchase,
+    ).join(OrderItem, OrderItem.order_id == Order.id) \
+        .join(customer, customer.id == Order.customer_id) \
+        .outerjoin(Product, Product.id == OrderItem.product_id) \
+        .outerjoin(farmer, farmer.id == Product.farmer_id)
+    if start is not None:
+        query = query.filter(Order.date >= start)
+    if end is not None:
+        query = query.filter(Order.date < end + timedelta(days=1))
+    if farmer_id is not None:
+        query = query.filter(Product.farmer_id == farmer_id)
+    query = query.order_by(Order.date, Order.id, OrderItem.id) \
+        .execution_options(yield_per=BATCH_SIZE)
+    for row in query:
+        *values, quantity, unit_price = row
+        yield (*values, quantity, unit_price, round(quantity * unit_price, 2))
+
+
+def _batched(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for batch in _batched(rows):
+        writer.writerows((r[0], r[1].isoformat(sep=' ', timespec='seconds'), *r[2:]) for r in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def jsonl_chunks(rows):
+    for batch in _batched(rows):
+        lines = []
+        for row in batch:
+            record = dict(zip(COLUMNS, row))
+            record['order_date'] = record['order_date'].isoformat()
+            lines.append(json.dumps(record))
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_orders(fmt='csv', start=None, end=None, farmer_id=None, gzip=False):
+    """Iterator of encoded chunks of the export file."""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unknown export format {fmt!r}; choose from {sorted(FORMATS)}')
+    rows = order_lines(start, end, farmer_id)
+    chunks = csv_chunks(rows) if fmt == 'csv' else jsonl_chunks(rows)
+    return gzip_chunks(chunks) if gzip else chunks
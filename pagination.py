@@ -0,0 +1,177 @@
+# pagination.py
+# Keyset (cursor) pagination for list pages.
+#
+# Instead of OFFSET, each page remembers the sort key of its first and last
+# row and the next request filters on "key after/before that value", which
+# lets SQLite seek straight to the page through the index. Page 500 costs the
+# same as page 1.
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import current_app, request, url_for
+from sqlalchemy import and_, or_
+
+
+class Page:
+    """One page of results plus the cursors needed to move around it."""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None, limit=None, prefix=''):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.limit = limit
+        self.prefix = prefix
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+# Types a decoded cursor may hold; datetimes arrive as {"dt": ...}
+CURSOR_TYPES = (str, int, float, type(None), datetime)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    raise TypeError(f'Cannot use {type(value).__name__} in a cursor')
+
+
+def _decode_value(obj):
+    if 'dt' in obj:
+        return datetime.fromisoformat(obj['dt'])
+    return obj
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':'), default=_encode_value)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from the query string; bad cursors count as no cursor."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')),
+                            object_hook=_decode_value)
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        return None
+    # The values become SQL bind parameters, so only scalars may pass
+    if not isinstance(values, list) or not all(isinstance(v, CURSOR_TYPES) for v in values):
+        return None
+    return values
+
+
+def page_args(prefix=''):
+    """Read (after, before, limit) for a paginated list from request.args."""
+    default = current_app.config['PAGE_SIZE']
+    maximum = current_app.config['MAX_PAGE_SIZE']
+    limit = request.args.get(prefix + 'limit', default, type=int)
+    limit = max(1, min(limit, maximum))
+    after = decode_cursor(request.args.get(prefix + 'after'))
+    before = decode_cursor(request.args.get(prefix + 'before'))
+    return after, before, limit
+
+
+def _seek(keys, values, forward):
+    # Build "(k1, k2, ...) comes after/before (v1, v2, ...)" for keys that may
+    # mix ascending and descending columns:
+    #   k1 > v1 OR (k1 = v1 AND k2 > v2) OR ...
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        later = (column < values[i]) if descending == forward else (column > values[i])
+        equal = [keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, later))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, keys, after=None, before=None, limit=20, prefix=''):
+    """Return one Page of `query` ordered by `keys`.
+
+    `keys` is a list of (column, descending) pairs that together must be
+    unique, e.g. [(Product.id, True)] or [(Product.category_id, False),
+    (Product.id, True)]. `after` / `before` are decoded cursors from a
+    previous Page.
+
+    Page items are the query's single entity, or a tuple per row when the
+    query selects several columns (see query.with_entities()).
+    """
+    columns = [column for column, _ in keys]
+    width = len(query.column_descriptions)
+    forward = before is None or after is not None
+    cursor = after if forward else before
+
+    if cursor is not None and len(cursor) == len(keys):
+        query = query.filter(_seek(keys, cursor, forward))
+    else:
+        cursor = None
+
+    ordering = []
+    for column, descending in keys:
+        # Walking backwards flips every sort direction; the rows are
+        # reversed again below so the page still reads in display order.
+        if descending == forward:
+            ordering.append(column.desc())
+        else:
+            ordering.append(column.asc())
+
+    rows = (query.order_by(None)
+                 .order_by(*ordering)
+                 .add_columns(*[c.label(f'_k{i}') for i, c in enumerate(columns)])
+                 .limit(limit + 1)
+                 .all())
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if not forward:
+        rows.reverse()
+
+    items = [row[0] if width == 1 else tuple(row[:width]) for row in rows]
+    first_key = list(rows[0][width:]) if rows else None
+    last_key = list(rows[-1][width:]) if rows else None
+
+    if forward:
+        next_cursor = encode_cursor(last_key) if more else None
+        prev_cursor = encode_cursor(first_key) if cursor is not None and rows else None
+    else:
+        next_cursor = encode_cursor(last_key) if rows else None
+        prev_cursor = encode_cursor(first_key) if more else None
+
+    return Page(items, next_cursor, prev_cursor, limit, prefix)
+
+
+def paginate_request(query, keys, prefix=''):
+    """keyset_paginate() driven by the current request's query string."""
+    after, before, limit = page_args(prefix)
+    return keyset_paginate(query, keys, after, before, limit, prefix)
+
+
+def page_url(page, direction):
+    """URL of the next/previous page, keeping the rest of the query string."""
+    prefix = page.prefix
+    args = request.args.to_dict()
+    args.pop(prefix + 'after', None)
+    args.pop(prefix + 'before', None)
+    if direction == 'next':
+        args[prefix + 'after'] = page.next_cursor
+    else:
+        args[prefix + 'before'] = page.prev_cursor
+    args.update(request.view_args or {})
+    return url_for(request.endpoint, **args)
@@ -0,0 +1,100 @@
+# passwords.py
+# Bcrypt hashing and verification on a small, bounded worker pool.
+#
+# Bcrypt is deliberately slow (~250 ms at cost 12). Running it on a fixed
+# pool caps how many CPU cores login traffic can take away from the rest of
+# the site, and a bounded queue in front of the pool means a login surge gets
+# a fast "try again" instead of piling up behind every worker.
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from extensions import bcrypt
+from metrics import BCRYPT_SECONDS
+
+
+def _timed(operation, fn, *args):
+    # Runs on the pool, so queueing time isn't counted
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        BCRYPT_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+
+class HasherBusy(Exception):
+    """The password pool is saturated; the caller should shed the request."""
+
+
+class PasswordHasher:
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.workers = 2
+        self.queue_size = 16
+        self.timeout = 10
+        self._executor = None
+        self._lock = threading.Lock()
+        self.in_flight = 0  # Running plus queued jobs
+        self.rejected = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', self.rounds)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.queue_size = app.config.get('PASSWORD_HASH_QUEUE', self.queue_size)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        app.extensions['password_hasher'] = self
+
+    def _pool(self):
+        # Created on first use so pre-fork servers don't fork live threads
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.workers,
+                                                        thread_name_prefix='bcrypt')
+        return self._executor
+
+    def _release(self, future=None):
+        with self._lock:
+            self.in_flight -= 1
+
+    def _run(self, fn, *args):
+        pool = self._pool()
+        with self._lock:
+            if self.in_flight >= self.workers + self.queue_size:
+                self.rejected += 1
+                raise HasherBusy()
+            self.in_flight += 1
+        try:
+            future = pool.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            raise HasherBusy()
+
+    def hash(self, password):
+        return self._run(_timed, 'hash', bcrypt.generate_password_hash,
+                         password, self.rounds).decode('utf-8')
+
+    def verify(self, password_hash, password):
+        return self._run(_timed, 'verify', bcrypt.check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with a different cost than configured."""
+        # Bcrypt hashes look like $2b$12$<salt+digest>
+        try:
+            return int(password_hash.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+    def stats(self):
+        return {'workers': self.workers, 'queue_size': self.queue_size,
+                'in_flight': self.in_flight, 'rejected': self.rejected}
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,132 @@
+# search.py
+# Full-text search over the product catalog, backed by an SQLite FTS5 table.
+#
+# products_fts holds one row per product (rowid == products.id) with the
+# product name, description and the farmer's farm_name. It is kept in sync by
+# triggers on the products and users tables, so every write path - ORM,
+# bulk query.delete() or raw SQL - updates the index without extra code in
+# the routes. Approval is not stored in the index; results are joined back to
+# products and narrowed by approved/category in the same statement.
+import re
+
+from sqlalchemy import column, literal_column, table, text, or_
+
+from extensions import db
+from models import Product, User
+
+FTS_TABLE = 'products_fts'
+
+products_fts = table(FTS_TABLE, column('rowid'))
+
+SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, farm_name,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description, farm_name)
+        VALUES (new.id, new.name, coalesce(new.description, ''),
+                (SELECT coalesce(farm_name, '') FROM users WHERE id = new.farmer_id));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au
+    AFTER UPDATE OF name, description, farmer_id ON products BEGIN
+        DELETE FROM products_fts WHERE rowid = old.id;
+        INSERT INTO products_fts(rowid, name, description, farm_name)
+        VALUES (new.id, new.name, coalesce(new.description, ''),
+                (SELECT coalesce(farm_name, '') FROM users WHERE id = new.farmer_id));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF farm_name ON users BEGIN
+        UPDATE products_fts SET farm_name = coalesce(new.farm_name, '')
+        WHERE rowid IN (SELECT id FROM products WHERE farmer_id = new.id);
+    END
+    """,
+]
+
+REBUILD_SQL = [
+    "DELETE FROM products_fts",
+    """
+    INSERT INTO products_fts(rowid, name, description, farm_name)
+    SELECT p.id, p.name, coalesce(p.description, ''), coalesce(u.farm_name, '')
+    FROM products p LEFT JOIN users u ON u.id = p.farmer_id
+    """,
+]
+
+# bm25() column weights: name, description, farm_name
+RANK = literal_column('bm25(products_fts, 10.0, 1.0, 4.0)')
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def init_search_index(rebuild=False):
+    """Create the FTS table and its sync triggers if they are missing."""
+    if not fts_available():
+        return
+    with db.engine.begin() as conn:
+        for statement in SEARCH_DDL:
+            conn.execute(text(statement))
+        if rebuild:
+            for statement in REBUILD_SQL:
+                conn.execute(text(statement))
+
+
+def build_match_expression(terms):
+    """Turn free text from the search box into a safe FTS5 MATCH string.
+
+    Each word is quoted (so FTS5 operators typed by users are treated as plain
+    text) and made a prefix match, e.g. "pan ghee" -> '"pan"* "ghee"*'.
+    """
+    tokens = _TOKEN_RE.findall(terms or '')
+    return ' '.join('"%s"*' % token for token in tokens)
+
+
+def search_products(terms=None, category_id=None):
+    """Query for approved products matching `terms`, narrowed to a category.
+
+    Ordering is left to the caller; see catalog_sort_keys().
+    """
+    query = Product.query.filter(Product.approved == True)
+    if category_id:
+        query = query.filter(Product.category_id == category_id)
+
+    match = build_match_expression(terms)
+    if not match:
+        return query
+
+    if fts_available():
+        return (query
+                .join(products_fts, products_fts.c.rowid == Product.id)
+                .filter(text('products_fts MATCH :match'))
+                .params(match=match))
+
+    # Non-SQLite databases fall back to a plain substring search
+    for token in _TOKEN_RE.findall(terms):
+        pattern = f'%{token}%'
+        query = query.filter(or_(Product.name.ilike(pattern),
+                                 Product.description.ilike(pattern),
+                                 Product.farmer.has(User.farm_name.ilike(pattern))))
+    return query
+
+
+def catalog_sort_keys(terms=None):
+    """Pagination keys for search_products(): best match first when there is
+    a full-text query, newest first otherwise."""
+    if build_match_expression(terms) and fts_available():
+        return [(RANK, False), (Product.id, True)]
+    return [(Product.id, True)]
@@ -0,0 +1,209 @@
+# shop.py
+# The public catalog and farmer pages, and the customer's cart, checkout
+# and order history.
+from datetime import datetime
+
+from flask import Blueprint, abort, flash, redirect, render_template, request, session, url_for
+from sqlalchemy import case, update
+from sqlalchemy.orm import selectinload
+
+from cart_store import carts
+from catalog import (get_catalog_page, get_categories, get_farmer_products, get_farmer_profile,
+                     invalidate_catalog)
+from extensions import db
+from httpcache import conditional_page
+from identity import get_current_user
+from models import Order, OrderItem, Product
+from pagination import paginate_request
+
+shop = Blueprint('shop', __name__)
+
+@shop.route('/')
+@conditional_page
+def index():
+    search = request.args.get('search', '').strip()
+    category_id = request.args.get('category', type=int)
+    products = get_catalog_page(search, category_id)
+    categories = get_categories()
+    return render_template('products.html', products=products, categories=categories)
+
+@shop.route('/customer_dashboard')
+def customer_dashboard():
+    if 'user_id' not in session or session['role'] != 'customer':
+        return redirect(url_for('auth.login'))
+    user = get_current_user()
+    return render_template('customer_dashboard.html', user=user)
+
+@shop.route('/cart', methods=['GET', 'POST']) # Add POST method
+def cart():
+    if 'user_id' not in session or session['role'] != 'customer':
+        return redirect(url_for('auth.login'))
+
+    # Handle POST request to update quantity
+    if request.method == 'POST':
+        product_id = request.form.get('product_id', type=int)
+        new_quantity = int(request.form.get('quantity', 1))
+
+        # Quantities of 0 or less remove the item
+        if product_id is not None:
+            carts.set_quantity(product_id, new_quantity)
+        flash('Cart updated!', 'success')
+        return redirect(url_for('shop.cart'))
+
+    # Lines carry the name and price cached when they were added
+    current = carts.current()
+    return render_template('cart.html', cart_items=current['items'], total=current['total'])
+
+@shop.route('/add_to_cart/<int:id>')
+def add_to_cart(id):
+    if 'user_id' not in session or session['role'] != 'customer':
+        return redirect(url_for('auth.login'))
+    
+    product = Product.query.get_or_404(id)
+    if not product.approved:
+        flash('Product not available', 'error')
+        return redirect(url_for('shop.index'))
+    
+    carts.add(product)
+    flash('Product added to cart', 'success')
+    return redirect(url_for('shop.index'))
+
+@shop.route('/remove_from_cart/<int:id>')
+def remove_from_cart(id):
+    if 'user_id' not in session or session['role'] != 'customer':
+        return redirect(url_for('auth.login'))
+    
+    if id in carts.current_lines():
+        carts.remove(id)
+        flash('Product removed from cart', 'success')
+    return redirect(url_for('shop.cart'))
+
+def reserve_stock(lines):
+    """Atomically take {product_id: quantity} out of stock.
+
+    A single UPDATE decrements every line, guarded by quantity >= requested
+    and approved, so two buyers can never both take the last units. Returns
+    (ok, shortfalls). If fewer rows changed than there are lines, nothing is
+    reserved: the transaction is rolled back, ok is False, and shortfalls
+    lists (product or None, quantity) for each line that can't be filled
+    now. It can be empty when other orders changed stock in between.
+    """
+    if any(quantity < 1 for quantity in lines.values()):
+        raise ValueError('cart quantities must be positive')
+    wanted = case(lines, value=Product.id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(lines), Product.approved == True, Product.quantity >= wanted)
+        .values(quantity=Product.quantity - wanted, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False))
+    if result.rowcount == len(lines):
+        return True, []
+
+    db.session.rollback()
+    current = {p.id: p for p in Product.query.filter(Product.id.in_(lines))
+               .populate_existing()}
+    shortfalls = []
+    for product_id, quantity in lines.items():
+        product = current.get(product_id)
+        if not product or not product.approved or product.quantity < quantity:
+            shortfalls.append((product, quantity))
+    return False, shortfalls
+
+@shop.route('/checkout', methods=['GET', 'POST'])
+def checkout():
+    if 'user_id' not in session or session['role'] != 'customer':
+        return redirect(url_for('auth.login'))
+    
+    # Get the current user's cart from the cart store
+    current = carts.current()
+    if not current['items']:
+        flash('Your cart is empty!', 'error')
+        return redirect(url_for('shop.cart'))
+    
+    if request.method == 'POST':
+        shipping_address = request.form['shipping_address']
+        lines = {item['product']['id']: item['quantity'] for item in current['items']}
+        
+        # Reserve all stock in one conditional UPDATE; on any shortfall
+        # nothing is decremented and every short item is reported
+        reserved, shortfalls = reserve_stock(lines)
+        if not reserved:
+            for product, quantity in shortfalls:
+                if not product or not product.approved:
+                    flash(f'Product "{product.name if product else "Unknown"}" is no longer available.', 'error')
+                else:
+                    flash(f'Not enough stock for {product.name}. Only {product.quantity} available.', 'error')
+            if not shortfalls:
+                flash('Stock changed while your order was being placed. Please check your cart and try again.', 'error')
+            return redirect(url_for('shop.cart'))
+        
+        # Create new order
+        order = Order(
+            customer_id=session['user_id'], 
+            date=datetime.utcnow(), 
+            shipping_address=shipping_address,
+            total=0,
+            item_count=0
+        )
+        db.session.add(order)
+        
+        # Charge current prices; the cart's cached ones may be out of date
+        prices = dict(db.session.query(Product.id, Product.price)
+                      .filter(Product.id.in_(lines)).all())
+        for product_id, quantity in lines.items():
+            db.session.add(OrderItem(
+                order=order, 
+                product_id=product_id, 
+                quantity=quantity,
+                price_at_purchase=prices[product_id]
+            ))
+            order.total += prices[product_id] * quantity
+            order.item_count += quantity
+        
+        db.session.commit()
+        invalidate_catalog()  # Stock levels shown on the catalog changed
+        carts.clear()  # Clear the cart
+        flash('Order placed successfully!', 'success')
+        return redirect(url_for('shop.order_history'))
+    
+    # Handle GET request - show checkout form
+    # Get the current user object to pre-fill the address
+    user = get_current_user()
+    return render_template('checkout.html', 
+                           user=user, 
+                           cart_items=current['items'], 
+                           total=current['total'])
+
+@shop.route('/order_history')
+def order_history():
+    if 'user_id' not in session or session['role'] != 'customer':
+        return redirect(url_for('auth.login'))
+    
+    orders = paginate_request(
+        Order.query.options(selectinload(Order.items).joinedload(OrderItem.product))
+            .filter_by(customer_id=session['user_id']),
+        [(Order.date, True), (Order.id, True)])
+    return render_template('order_history.html', orders=orders)
+
+@shop.route('/farmer/<int:farmer_id>')
+@conditional_page
+def view_farmer(farmer_id):
+    # Get the farmer from database
+    farmer = get_farmer_profile(farmer_id)
+    if farmer is None:
+        abort(404)
+    
+    # Check if user is actually a farmer
+    if farmer['role']['name'] != 'farmer':
+        flash('User is not a farmer.', 'error')
+        return redirect(url_for('shop.index'))
+    
+    # Check if farmer is approved (only show approved farmers to customers)
+    if not farmer['is_approved']:
+        flash('Farmer profile is not available.', 'error')
+        return redirect(url_for('shop.index'))
+    
+    # Get all approved products from this farmer
+    products = get_farmer_products(farmer_id)
+    
+    return render_template('farmer_profile.html', farmer=farmer, products=products)
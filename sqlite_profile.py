@@ -0,0 +1,177 @@
+# sqlite_profile.py
+# PRAGMA settings applied to every new SQLite connection.
+#
+# With the stock settings (rollback journal, fsync on every commit) readers
+# queue behind writers and concurrent checkouts end in "database is locked".
+# The 'production' profile switches to WAL, so readers never block the
+# writer or each other, syncs less often, and sets an explicit wait for the
+# write lock.
+#
+# SQLITE_PROFILE picks the profile; SQLITE_PRAGMAS overrides single values.
+# Non-SQLite databases are left untouched.
+#
+# In-memory SQLite ('sqlite://', as in tests) runs on a single shared
+# connection (StaticPool), which takes no pool sizing; pool_options() drops
+# those keys from SQLALCHEMY_ENGINE_OPTIONS before the engine is created.
+#
+# `flask bench-sqlite` compares read and write throughput of two profiles
+# on a scratch database at several thread counts.
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, make_url, text
+
+from extensions import db
+
+PROFILES = {
+    # SQLite's own defaults, for comparison
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',         # Readers and the writer stop blocking each other
+        'synchronous': 'NORMAL',       # Safe with WAL; fsync at checkpoints, not every commit
+        'busy_timeout': 5000,          # ms to wait for the write lock before "database is locked"
+        'cache_size': -64000,          # Negative = KiB, so 64 MB of page cache per connection
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON',
+    },
+}
+
+
+def profile_pragmas(app):
+    pragmas = dict(PROFILES[app.config.get('SQLITE_PROFILE', 'production')])
+    pragmas.update(app.config.get('SQLITE_PRAGMAS') or {})
+    return pragmas
+
+
+def apply_pragmas(engine, pragmas):
+    """Run `PRAGMA name=value` for each entry on every new connection."""
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+# Queue pool settings that StaticPool rejects
+POOL_SIZING = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+def in_memory(uri):
+    url = make_url(uri)
+    return (url.get_backend_name() == 'sqlite'
+            and (url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'))
+
+
+def pool_options(app):
+    """Drop pool sizing from SQLALCHEMY_ENGINE_OPTIONS for in-memory SQLite.
+    Must run before db.init_app(), which creates the engine."""
+    if in_memory(app.config['SQLALCHEMY_DATABASE_URI']):
+        options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            key: value for key, value in options.items() if key not in POOL_SIZING}
+
+
+def init_sqlite_profile(app):
+    pragmas = profile_pragmas(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                apply_pragmas(engine, pragmas)
+
+
+# --- Benchmark ---------------------------------------------------------------
+
+BENCH_PRODUCTS = 2000
+
+
+def _scratch_engine(path, pragmas, threads):
+    engine = create_engine(f'sqlite:///{path}', pool_size=threads, max_overflow=0)
+    apply_pragmas(engine, pragmas)
+    return engine
+
+
+def _seed(engine):
+    db.metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO roles (id, name) VALUES (1, 'farmer'), (2, 'customer')"))
+        conn.execute(text(
+            "INSERT INTO users (id, name, email, password, role_id, is_approved) "
+            "VALUES (1, 'Farmer', 'f@example.com', 'x', 1, 1), (2, 'Customer', 'c@example.com', 'x', 2, 1)"))
+        conn.execute(text(
+            "INSERT INTO products (name, description, price, quantity, approved, farmer_id, updated_at) "
+            "VALUES (:name, 'bench', :price, 1000000, 1, 1, :now)"),
+            [{'name': f'Product {i}', 'price': 10 + i % 50, 'now': now} for i in range(BENCH_PRODUCTS)])
+
+
+def _read(conn):
+    conn.execute(text('SELECT id, name, price FROM products WHERE approved = 1 '
+                      'ORDER BY id DESC LIMIT 24')).all()
+    conn.execute(text('SELECT * FROM products WHERE id = :id'),
+                 {'id': random.randint(1, BENCH_PRODUCTS)}).first()
+
+
+def _write(conn):
+    product_id = random.randint(1, BENCH_PRODUCTS)
+    with conn.begin():
+        conn.execute(text('UPDATE products SET quantity = quantity - 1 WHERE id = :id AND quantity > 0'),
+                     {'id': product_id})
+        order_id = conn.execute(text(
+            "INSERT INTO orders (date, shipping_address, customer_id, total, item_count) "
+            "VALUES (:now, 'bench', 2, 10, 1)"), {'now': datetime.utcnow()}).lastrowid
+        conn.execute(text('INSERT INTO order_items (order_id, product_id, quantity, price_at_purchase) '
+                          'VALUES (:order_id, :product_id, 1, 10)'),
+                     {'order_id': order_id, 'product_id': product_id})
+
+
+def benchmark(pragmas, threads, seconds=3.0, write_ratio=0.2):
+    """Mixed read/write load on a fresh scratch database.
+
+    Returns {'reads': per second, 'writes': per second, 'errors': count}.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _scratch_engine(os.path.join(tmp, 'bench.db'), pragmas, threads)
+        _seed(engine)
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def worker():
+            reads = writes = errors = 0
+            with engine.connect() as conn:
+                while time.perf_counter() < deadline:
+                    try:
+                        if random.random() < write_ratio:
+                            _write(conn)
+                            writes += 1
+                        else:
+                            _read(conn)
+                            conn.rollback()  # End the implicit read transaction
+                            reads += 1
+                    except Exception:
+                        errors += 1
+                        conn.rollback()
+            with lock:
+                counts['reads'] += reads
+                counts['writes'] += writes
+                counts['errors'] += errors
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+    return {'reads': counts['reads'] / elapsed, 'writes': counts['writes'] / elapsed,
+            'errors': counts['errors']}
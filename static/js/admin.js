@@ -0,0 +1,29 @@
+// Bulk moderation: post the ticked ids, then drop the handled rows in place
+document.querySelectorAll('[data-bulk-table]').forEach(function(table) {
+    const queue = table.dataset.bulkTable;
+    table.querySelector('[data-bulk-all]').addEventListener('change', function() {
+        table.querySelectorAll('[data-bulk-id]').forEach(box => { box.checked = this.checked; });
+    });
+    document.querySelectorAll(`[data-bulk-actions="${queue}"] [data-bulk-action]`).forEach(function(button) {
+        button.addEventListener('click', async function() {
+            const ids = Array.from(table.querySelectorAll('[data-bulk-id]:checked'), box => box.value);
+            const action = button.dataset.bulkAction;
+            if (!ids.length) return;
+            if (action === 'reject' && !confirm(`Reject ${ids.length} selected ${queue}?`)) return;
+            const response = await fetch(table.dataset.bulkUrl, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({action: action, ids: ids})
+            });
+            const result = await response.json();
+            if (!response.ok) { alert(result.error); return; }
+            result.done.forEach(id => table.querySelector(`tr[data-id="${id}"]`)?.remove());
+            document.querySelector('[data-pending-count="products"]').textContent = result.pending_products;
+            document.querySelector('[data-pending-count="farmers"]').textContent = result.pending_farmers;
+            if (result.skipped.length) {
+                const done = {approve: 'approved', reject: 'rejected'}[action];
+                alert(`${result.skipped.length} could not be ${done} (already handled, or referenced by orders or products).`);
+            }
+        });
+    });
+});
@@ -0,0 +1,35 @@
+// Clock functionality
+function updateClock() {
+    const now = new Date();
+    const hours = now.getHours().toString().padStart(2, '0');
+    const minutes = now.getMinutes().toString().padStart(2, '0');
+    const seconds = now.getSeconds().toString().padStart(2, '0');
+
+    // Update digital clock
+    document.getElementById('digital-clock').textContent = `${hours}:${minutes}:${seconds}`;
+
+    // Update analog clock
+    const secondDegrees = ((seconds / 60) * 360) + 90;
+    const minuteDegrees = ((minutes / 60) * 360) + ((seconds/60)*6) + 90;
+    const hourDegrees = ((hours / 12) * 360) + ((minutes/60)*30) + 90;
+
+    document.getElementById('second-hand').style.transform = `rotate(${secondDegrees}deg)`;
+    document.getElementById('minute-hand').style.transform = `rotate(${minuteDegrees}deg)`;
+    document.getElementById('hour-hand').style.transform = `rotate(${hourDegrees}deg)`;
+}
+
+// Initial call and set interval
+updateClock();
+setInterval(updateClock, 1000);
+
+// Add scroll effect to header
+window.addEventListener('scroll', function() {
+    const header = document.querySelector('.header');
+    if (window.scrollY > 50) {
+        header.style.boxShadow = '0 4px 10px rgba(0, 0, 0, 0.1)';
+        header.style.background = 'linear-gradient(135deg, #ffffff 0%, #ffffff 100%)';
+    } else {
+        header.style.boxShadow = '0 4px 20px rgba(0, 0, 0, 0.09)';
+        header.style.background = 'linear-gradient(135deg, #ffffff 0%, #f0f7ff 100%)';
+    }
+});
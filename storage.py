@@ -0,0 +1,216 @@
+# storage.py
+# Content-addressed upload storage.
+#
+# An upload is hashed while it is copied to a temp file and then stored as
+# uploads/<kind>/<sha256>.<ext>. Uploading the same bytes again reuses the
+# existing file, and since a name can only ever refer to one content, URLs
+# for it are safe to cache forever (see uploads.py).
+#
+# Files are shared, so routes never delete them (discard_upload() removes a
+# file that failed a check made after it was stored, and only while nothing
+# references it). The reference count of a
+# file is the number of rows pointing at it from the columns in REFERENCES,
+# and `flask gc-uploads` removes files (and their variants) whose count has
+# dropped to zero, e.g. after delete_product, reject_product or delete_user.
+#
+# Uploads are validated as they stream: routes that take files declare the
+# kinds they accept with @accepts_uploads, which turns away bodies whose
+# Content-Length is over the combined limit before any of it is read.
+# UploadRequest spools every file part to disk past a small buffer, and
+# store_upload() checks the first bytes against the image signatures and
+# stops copying as soon as the per-kind limit is passed.
+import hashlib
+import os
+import tempfile
+import time
+from datetime import timedelta
+from functools import wraps
+
+from flask import Request, abort, current_app, flash, redirect, request
+from sqlalchemy import func
+
+from extensions import db
+from metrics import UPLOAD_BYTES, UPLOADS_REJECTED
+from models import Product, User
+
+CHUNK_SIZE = 64 * 1024
+TEMP_PREFIX = '.upload-'
+FORM_OVERHEAD = 64 * 1024  # Allowance for the non-file fields of a multipart form
+
+# Leading bytes -> extension the file is stored with
+SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+
+REFERENCES = {
+    'products': [Product.image],
+    'profiles': [User.profile_picture],
+    'licenses': [User.license_filename],
+}
+
+
+class UploadRejected(Exception):
+    """The upload failed validation; the message is safe to show the user."""
+
+
+class UploadRequest(Request):
+    """Request whose multipart file parts never sit in memory past a small
+    buffer, however small the file (Werkzeug keeps up to 500 KB in RAM)."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return tempfile.SpooledTemporaryFile(
+            max_size=current_app.config.get('UPLOAD_SPOOL_SIZE', CHUNK_SIZE), mode='w+b')
+
+
+def upload_limit(kind):
+    return current_app.config['UPLOAD_LIMITS'][kind]
+
+
+def accepts_uploads(*kinds):
+    """Reject a request with 413 before its body is read if its
+    Content-Length is more than the listed kinds could legitimately add up to."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == 'POST' and request.content_length:
+                allowed = sum(upload_limit(kind) for kind in kinds) + FORM_OVERHEAD
+                if request.content_length > allowed:
+                    abort(413)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def upload_too_large(e):
+    """413 handler: report the oversized upload on the page it came from."""
+    flash('The uploaded file is too large.', 'error')
+    return redirect(request.url)
+
+
+def allowed_file(filename):
+    return '.' in filename and \
+           filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def _sniff(head):
+    for signature, extension in SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def _folder(kind):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], kind)
+
+
+def store_upload(kind, file):
+    """Save a werkzeug FileStorage under its SHA-256 and return the filename.
+
+    Raises UploadRejected if the content isn't a PNG, JPEG or GIF, or is
+    larger than UPLOAD_LIMITS[kind]. The stored extension comes from the
+    content, not from the name the client sent.
+    """
+    limit = upload_limit(kind)
+    head = file.stream.read(CHUNK_SIZE)
+    extension = _sniff(head)
+    if extension is None:
+        UPLOADS_REJECTED.inc(kind=kind)
+        raise UploadRejected('Only PNG, JPEG and GIF images can be uploaded.')
+
+    folder = _folder(kind)
+    os.makedirs(folder, exist_ok=True)
+    # The temp file sits in the target folder so the final rename is atomic
+    fd, temp_path = tempfile.mkstemp(prefix=TEMP_PREFIX, dir=folder)
+    sha = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            chunk = head
+            while chunk:
+                size += len(chunk)
+                if size > limit:
+                    UPLOADS_REJECTED.inc(kind=kind)
+                    raise UploadRejected(f'Files of this kind can be at most {limit / (1024 * 1024):g} MB.')
+                sha.update(chunk)
+                out.write(chunk)
+                chunk = file.stream.read(CHUNK_SIZE)
+        filename = f'{sha.hexdigest()}.{extension}'
+        target = os.path.join(folder, filename)
+        if os.path.exists(target):
+            # Already stored. Touch it so a concurrent gc treats it as new.
+            os.unlink(temp_path)
+            os.utime(target)
+        else:
+            os.replace(temp_path, target)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    UPLOAD_BYTES.inc(size, kind=kind)
+    return filename
+
+
+def discard_upload(kind, filename):
+    """Delete a file store_upload() just saved and a later check refused,
+    unless a row already references the same content."""
+    for column in REFERENCES[kind]:
+        if db.session.query(column).filter(column == filename).first() is not None:
+            return
+    path = os.path.join(_folder(kind), filename)
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def reference_counts(kind):
+    """{filename: number of rows referencing it} for one upload kind."""
+    counts = {}
+    for column in REFERENCES[kind]:
+        rows = db.session.query(column, func.count()).filter(column.isnot(None)).group_by(column)
+        for filename, count in rows:
+            counts[filename] = counts.get(filename, 0) + count
+    return counts
+
+
+def collect_garbage(grace=None, dry_run=False):
+    """Delete unreferenced uploads older than `grace`; returns their paths.
+
+    The grace period covers files stored by a request that hasn't committed
+    the row pointing at them yet, and abandoned temp files.
+    """
+    if grace is None:
+        grace = current_app.config.get('UPLOAD_GC_GRACE', timedelta(hours=1))
+    cutoff = time.time() - grace.total_seconds()
+    removed = []
+
+    def remove(path):
+        if os.path.getmtime(path) >= cutoff:
+            return False
+        removed.append(path)
+        if not dry_run:
+            os.unlink(path)
+        return True
+
+    for kind in REFERENCES:
+        folder = _folder(kind)
+        if not os.path.isdir(folder):
+            continue
+        referenced = reference_counts(kind)
+        kept = set()
+        for filename in os.listdir(folder):
+            path = os.path.join(folder, filename)
+            if not os.path.isfile(path):
+                continue
+            if filename in referenced or not remove(path):
+                kept.add(os.path.splitext(filename)[0])
+
+        variants = os.path.join(folder, 'variants')
+        if os.path.isdir(variants):
+            for filename in os.listdir(variants):
+                # <stem>.<variant>.<fmt>
+                if filename.rsplit('.', 2)[0] not in kept:
+                    remove(os.path.join(variants, filename))
+    return removed
@@ -0,0 +1,141 @@
+# uploads.py
+# One blueprint serving everything under UPLOAD_FOLDER.
+#
+# Public images (products, profiles and their variants) are linked with a
+# ?v=<content digest> query string by upload_url(). A request carrying the
+# current digest can be cached for a year as immutable, because new content
+# always produces a new URL. Requests without it still get an ETag and must
+# revalidate. Range requests are handled by send_file.
+#
+# Licence documents are private: only admins and the farmer who uploaded
+# them may fetch them, and they are never stored by shared caches.
+#
+# UPLOADS_SENDFILE hands the file body to the front-end server instead of
+# streaming it from Python:
+#   None         - Flask sends the bytes (default, and what the dev server needs)
+#   'x-sendfile' - X-Sendfile: <absolute path> (Apache mod_xsendfile, lighttpd)
+#   'x-accel'    - X-Accel-Redirect: <UPLOADS_ACCEL_PREFIX><kind>/<file> (nginx;
+#                  the prefix must be an `internal` location aliased to UPLOAD_FOLDER)
+import hashlib
+import mimetypes
+import os
+from functools import lru_cache
+from urllib.parse import quote
+
+from flask import Blueprint, abort, current_app, request, url_for
+from werkzeug.utils import send_from_directory
+
+from identity import get_current_user
+
+uploads = Blueprint('uploads', __name__, url_prefix='/uploads')
+
+PUBLIC_KINDS = ('products', 'profiles')
+SENDFILE_MODES = (None, 'x-sendfile', 'x-accel')
+
+IMMUTABLE = 'public, max-age={max_age}, immutable'
+REVALIDATE = 'public, no-cache'
+PRIVATE = 'private, no-store'
+
+
+@lru_cache(maxsize=4096)
+def _digest(path, mtime_ns, size):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()[:16]
+
+
+def file_digest(path):
+    """Short content hash of a file, or None if it doesn't exist.
+
+    Memoized on (path, mtime, size) so each file is only read once per change.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return _digest(path, st.st_mtime_ns, st.st_size)
+
+
+def _directory(kind, variants=False):
+    folder = os.path.join(current_app.config['UPLOAD_FOLDER'], kind)
+    return os.path.join(folder, 'variants') if variants else folder
+
+
+def upload_url(kind, filename, variants=False):
+    """Versioned URL for a public upload (or one of its variants)."""
+    endpoint = 'uploads.variant' if variants else 'uploads.public'
+    version = file_digest(os.path.join(_directory(kind, variants), filename))
+    if version is None:
+        return url_for(endpoint, kind=kind, filename=filename)
+    return url_for(endpoint, kind=kind, filename=filename, v=version)
+
+
+def _check_filename(filename):
+    # Security check to prevent directory traversal attacks
+    if '..' in filename or filename.startswith('/') or '\\' in filename:
+        abort(404)
+
+
+def _send(directory, relative, filename, cache_control, etag=None):
+    mode = current_app.config.get('UPLOADS_SENDFILE')
+    if mode not in SENDFILE_MODES:
+        raise ValueError(f'Unknown UPLOADS_SENDFILE {mode!r}; choose from {SENDFILE_MODES}')
+    path = os.path.join(directory, filename)
+    if not os.path.isfile(path):
+        abort(404)
+
+    if mode == 'x-accel':
+        if etag and request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            # nginx serves the body, and handles Range, from its internal location
+            response = current_app.response_class()
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            prefix = current_app.config.get('UPLOADS_ACCEL_PREFIX', '/protected-uploads/')
+            response.headers['X-Accel-Redirect'] = quote(f'{prefix.rstrip("/")}/{relative}/{filename}')
+    else:
+        # Werkzeug's helper rather than Flask's, which would override
+        # use_x_sendfile with the app-wide USE_X_SENDFILE setting
+        response = send_from_directory(directory, filename, request.environ,
+                                       etag=etag or True, use_x_sendfile=mode == 'x-sendfile',
+                                       response_class=current_app.response_class)
+    if etag:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+def _send_public(kind, filename, variants=False):
+    if kind not in PUBLIC_KINDS:
+        abort(404)
+    _check_filename(filename)
+    directory = _directory(kind, variants)
+    etag = file_digest(os.path.join(directory, filename))
+    if etag is not None and request.args.get('v') == etag:
+        cache_control = IMMUTABLE.format(max_age=current_app.config.get('UPLOADS_MAX_AGE', 31536000))
+    else:
+        cache_control = REVALIDATE
+    relative = f'{kind}/variants' if variants else kind
+    return _send(directory, relative, filename, cache_control, etag)
+
+
+@uploads.route('/<kind>/<filename>')
+def public(kind, filename):
+    return _send_public(kind, filename)
+
+
+@uploads.route('/<kind>/variants/<filename>')
+def variant(kind, filename):
+    return _send_public(kind, filename, variants=True)
+
+
+@uploads.route('/licenses/<filename>')
+def license_file(filename):
+    _check_filename(filename)
+    user = get_current_user()
+    if user is None or (user.role_name != 'admin' and user.license_filename != filename):
+        abort(404)
+    return _send(_directory('licenses'), 'licenses', filename, PRIVATE)
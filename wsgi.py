@@ -0,0 +1,51 @@
+# wsgi.py
+# Production entry point, for pre-fork servers that build the app once in
+# the master process and then fork the workers:
+#
+#     gunicorn --preload --workers 4 wsgi:app
+#
+# What every worker would otherwise load on its first requests (compiled
+# templates, the role map) is loaded here, once, and gc.freeze() moves it
+# all out of the collector's sight, so workers keep sharing those pages
+# copy-on-write instead of touching them on their first collection.
+#
+# Pooled database connections must never be shared across a fork: the
+# master closes its pool before forking, and each worker discards whatever
+# it inherited and opens its own.
+import gc
+import os
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import create_app
+from extensions import db
+from models import role_map
+
+app = create_app()
+
+
+def warm_up(app):
+    """Compile every template and read the role map ahead of the first
+    request; returns the database engines, with their pools emptied."""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    with app.app_context():
+        try:
+            role_map.load()
+        except SQLAlchemyError as e:
+            app.logger.warning('Roles not loaded (run `flask init-db`?): %s', e)
+        engines = list(db.engines.values())
+    for engine in engines:
+        engine.dispose()
+    return engines
+
+
+def _after_fork(engines):
+    for engine in engines:
+        # Forget the parent's connections without closing them under it
+        engine.dispose(close=False)
+
+
+_engines = warm_up(app)
+os.register_at_fork(after_in_child=lambda: _after_fork(_engines))
+gc.freeze()